@@ -0,0 +1,37 @@
+"""add user pagination indexes
+
+Revision ID: b7c4e1f9a2d3
+Revises: 618372d12079
+Create Date: 2026-10-17 10:12:44.213907
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+revision = 'b7c4e1f9a2d3'
+down_revision = '618372d12079'
+branch_labels = None
+depends_on = None
+
+# Keyset pagination of GET /users on (created_at, id), optionally filtered
+INDEXES = {
+    "ix_users_created_at_id": ["created_at", "id"],
+    "ix_users_role_is_active_created_at_id": ["role", "is_active", "created_at", "id"],
+    "ix_users_is_active_created_at_id": ["is_active", "created_at", "id"],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, but keeps the table writable while building
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(
+                name, "users", columns, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name="users", postgresql_concurrently=True, if_exists=True)
@@ -1,15 +1,27 @@
+from fastapi.responses import StreamingResponse
+
 from app.core.errors import ForbiddenError, NotFoundError
+from app.core.security import Principal
 from app.mediators.user_mediator import UserMediator
 from app.models.user import User
 from app.schemas.auth_schema import Role
-from app.schemas.user_schema import UserDeleteResponse, UserRead, UserUpdate, UserUpdateResponse
+from app.schemas.user_schema import (
+    ExportFormat,
+    UserDeleteResponse,
+    UserPage,
+    UserRead,
+    UserUpdate,
+    UserUpdateResponse,
+)
 
 
 class UserController:
     def __init__(self, mediator: UserMediator) -> None:
         self.mediator = mediator
 
-    async def update_user(self, user_id: str, user_update: UserUpdate, current_user: User) -> UserUpdateResponse:
+    async def update_user(
+        self, user_id: str, user_update: UserUpdate, current_user: User | Principal
+    ) -> UserUpdateResponse:
         if current_user.id != user_id and current_user.role != Role.admin:
             raise ForbiddenError(message="Unable to change")
         updates = user_update.model_dump(exclude_unset=True)
@@ -19,7 +31,7 @@ class UserController:
             user=UserRead.model_validate(user)
         )
 
-    async def delete_user(self, user_id: str, current_user: User) -> UserDeleteResponse:
+    async def delete_user(self, user_id: str, current_user: User | Principal) -> UserDeleteResponse:
         if current_user.id != user_id and current_user.role != Role.admin:
             raise ForbiddenError(message="Unable to delete")
         success = await self.mediator.delete_user(user_id)
@@ -30,5 +42,25 @@ class UserController:
     async def get_user(self, user_id: str) -> UserRead:
         return await self.mediator.get_user(user_id)
 
-    async def list_users(self) -> list[UserRead]:
-        return await self.mediator.list_users()
+    async def list_users(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        role: Role | None = None,
+        is_active: bool | None = None,
+    ) -> UserPage:
+        return await self.mediator.list_users(limit, cursor, role=role, is_active=is_active)
+
+    def export_users(
+        self,
+        export_format: ExportFormat,
+        chunk_size: int,
+        role: Role | None = None,
+        is_active: bool | None = None,
+    ) -> StreamingResponse:
+        media_type = "text/csv" if export_format is ExportFormat.csv else "application/x-ndjson"
+        return StreamingResponse(
+            self.mediator.export_users(export_format, chunk_size, role=role, is_active=is_active),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="users.{export_format.value}"'},
+        )
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app.api.v1.controllers.user_controller import UserController
+from app.api.v1.routers.user_router import get_user_controller
+from app.cache import user_hot_keys
+from app.core.config import settings
+from app.core.security import get_current_admin
+from app.schemas.auth_schema import Role
+from app.schemas.cache_schema import HotKey, HotKeysResponse
+from app.schemas.user_schema import ExportFormat
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/cache/hot-users", response_model=HotKeysResponse)
+async def hot_users(limit: int = Query(100, ge=1, le=10_000)) -> HotKeysResponse:
+    if user_hot_keys is None:
+        return HotKeysResponse(enabled=False, local=[], shared=[])
+    return HotKeysResponse(
+        enabled=True,
+        local=[HotKey(key=key, count=count) for key, count in user_hot_keys.top(limit)],
+        shared=[HotKey(key=key, count=count) for key, count in await user_hot_keys.load(limit)],
+    )
+
+
+@router.get("/users/export", response_class=StreamingResponse)
+async def export_users(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    role: Role | None = None,
+    is_active: bool | None = None,
+    controller: UserController = Depends(get_user_controller),
+) -> StreamingResponse:
+    # Streamed straight from a server-side cursor; a slow client pauses the read
+    return controller.export_users(
+        export_format, settings.users_export_chunk_size, role=role, is_active=is_active
+    )
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import get_current_user
-from app.db.session import get_db_session
 from app.api.v1.controllers.user_controller import UserController
+from app.core.config import settings
+from app.core.security import Principal, get_current_principal
+from app.db.session import get_db_session
 from app.mediators.user_mediator import UserMediator
-from app.models.user import User
 from app.repositories.user_repository import UserRepository
 from app.schemas.auth_schema import Role
-from app.schemas.user_schema import UserRead, UserUpdate, UserUpdateResponse, UserDeleteResponse
+from app.schemas.user_schema import (
+    UserDeleteResponse,
+    UserPage,
+    UserRead,
+    UserUpdate,
+    UserUpdateResponse,
+)
 from app.services.user_service import UserService
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -25,7 +31,7 @@ def get_user_controller(session: AsyncSession = Depends(get_db_session)) -> User
 async def update_user(
     user_id: str,
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     controller: UserController = Depends(get_user_controller)
 ) -> UserUpdateResponse:
     return await controller.update_user(user_id, user_update, current_user)
@@ -34,7 +40,7 @@ async def update_user(
 @router.delete("/{user_id}", response_model=UserDeleteResponse)
 async def delete_user(
     user_id: str,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     controller: UserController = Depends(get_user_controller)
 ) -> UserDeleteResponse:
     return await controller.delete_user(user_id, current_user)
@@ -47,6 +53,12 @@ async def get_user(
     return await controller.get_user(user_id)
 
 
-@router.get("", response_model=list[UserRead])
-async def list_users(controller: UserController = Depends(get_user_controller)) -> list[UserRead]:
-    return await controller.list_users()
+@router.get("", response_model=UserPage)
+async def list_users(
+    limit: int = Query(settings.users_page_size_default, ge=1, le=settings.users_page_size_max),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    role: Role | None = None,
+    is_active: bool | None = None,
+    controller: UserController = Depends(get_user_controller),
+) -> UserPage:
+    return await controller.list_users(limit, cursor, role=role, is_active=is_active)
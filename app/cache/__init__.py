@@ -4,88 +4,697 @@ Usage:
     from app.cache import cache, CacheBackend, get_redis
 
     await cache.set("key", "value", ttl=60)
+
+With ``CACHE_LOCAL_ENABLED`` the cache keeps a bounded in-process L1 tier
+(`LocalCache`) in front of Redis. Writes and deletes publish the affected
+keys on ``CACHE_INVALIDATION_CHANNEL`` so every worker running
+`Cache.listen_for_invalidations` evicts its own L1 copy.
+
+With ``REDIS_CLIENT_TRACKING`` the L1 tier is kept coherent by Redis itself
+instead: one dedicated connection enables ``CLIENT TRACKING`` in broadcast
+mode for ``REDIS_TRACKING_PREFIXES`` and receives the server's invalidation
+messages. Servers without tracking support (or cluster clients) fall back to
+the pub/sub channel above.
+
+`set`/`set_many` accept ``soft_ttl`` to store a soft expiry next to the
+value; `get_entry` returns it as a `CacheEntry` so callers can serve stale
+values while refreshing in the background (see `SingleFlight.spawn`).
+
+Cache operations go through `redis_breaker`: while it is open they return
+misses immediately instead of waiting out socket timeouts, so callers read
+the database directly. L1 hits are served before the breaker is consulted
+(with the last known namespace generation while it is open) and never count
+as Redis successes.
+
+Clients come from `redis_clients`, which keeps a bounded pool per workload
+(``REDIS_POOLS``: cache, limiter, pubsub); see `app.cache.clients`.
+
+`single_flight` coalesces concurrent cache-miss loads for the same key; see
+`app.cache.singleflight`. `email_filter` is the optional Bloom filter of
+known user emails (``USER_EMAIL_BLOOM_ENABLED``); see `app.cache.bloom`.
+
+`user_hot_keys` tracks the most frequently read user ids
+(``USER_HOT_KEYS_ENABLED``) so they can be warmed; see `app.cache.hotkeys`.
+
+`cached` caches the results of async service/mediator methods under tags
+that `invalidate_tags` expires; see `app.cache.decorator`.
 """
 from __future__ import annotations
 
 import asyncio
 import json
 import logging
-from typing import Any, Optional, Protocol
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import nullcontext
+from typing import Any, Protocol
 
-from redis.asyncio import Redis, from_url
+from redis.asyncio import Redis
+from redis.asyncio.cluster import RedisCluster
+from redis.crc import key_slot
+from redis.exceptions import ResponseError
 
+from app.cache.bloom import BloomFilter
+from app.cache.clients import REDIS_ERRORS, RedisClientManager
+from app.cache.codec import CacheCodec
+from app.cache.decorator import ModelCodec, cached
+from app.cache.entry import CacheEntry
+from app.cache.hotkeys import HotKeyTracker
+from app.cache.idempotency import RedisIdempotencyStore
+from app.cache.local import LocalCache
+from app.cache.metrics import CACHE_REQUESTS
+from app.cache.principals import PrincipalCache
+from app.cache.revocations import TokenRevocations
+from app.cache.singleflight import SingleFlight
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, get_breaker
 from app.core.config import settings
 
-logger = logging.getLogger("app.cache")
-
-_redis: Optional[Redis] = None
-_lock = asyncio.Lock()
+__all__ = [
+    "Cache",
+    "CacheBackend",
+    "ModelCodec",
+    "cache",
+    "cached",
+    "email_filter",
+    "get_redis",
+    "idempotency_store",
+    "principal_cache",
+    "redis_breaker",
+    "redis_clients",
+    "single_flight",
+    "token_revocations",
+    "user_hot_keys",
+]
 
+logger = logging.getLogger("app.cache")
 
 class CacheBackend(Protocol):
-    async def set(self, key: str, value: Any, ttl: int | None = None) -> None: ...
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int | None = None,
+        soft_ttl: float | None = None,
+        delta: float = 0.0,
+    ) -> None: ...
     async def get(self, key: str) -> Any | None: ...
+    async def get_entry(self, key: str) -> CacheEntry | None: ...
     async def delete(self, key: str) -> None: ...
+    async def get_many(self, keys: list[str]) -> dict[str, Any]: ...
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        ttl: int | None = None,
+        soft_ttl: float | None = None,
+        delta: float = 0.0,
+    ) -> None: ...
+    async def delete_many(self, keys: list[str]) -> None: ...
+    async def tag_versions(self, tags: Iterable[str]) -> list[int] | None: ...
+    async def invalidate_tags(self, *tags: str) -> None: ...
 
 
-async def get_redis() -> Redis:
-    """Return a lazily-initialised singleton Redis client (cluster or single)."""
-    global _redis
-    if _redis:
-        return _redis
+redis_clients = RedisClientManager.from_settings(settings)
+# Client of the general-purpose "cache" pool
+get_redis = redis_clients.provider("cache")
+# Shared by every Redis workload: a dead server trips it for all of them
+redis_breaker = get_breaker("redis", expected=REDIS_ERRORS)
 
-    async with _lock:
-        if _redis:
-            return _redis
 
-        if settings.redis_cluster_nodes:
-            # Cluster mode
-            nodes = [node.strip() for node in settings.redis_cluster_nodes.split(",") if node.strip()]
-            _redis = Redis.from_cluster(nodes=nodes, password=settings.redis_password, decode_responses=True)
-        else:
-            _redis = from_url(settings.redis_url, password=settings.redis_password, decode_responses=True)
-        return _redis
+def _log_failure(message: str, error: Exception) -> None:
+    # An open circuit is already reported by the breaker's metrics
+    if not isinstance(error, CircuitOpenError):
+        logger.warning(f"{message}: {error}")
 
 
 class Cache:
-    def __init__(self, client_provider=get_redis):
+    """JSON cache on Redis with an optional L1 tier and versioned namespaces.
+
+    Keys whose first segment is one of ``namespaces`` (e.g. ``user:42``) are
+    stored under the namespace's current generation (``user:v3:42``).
+    `invalidate_namespace` bumps the generation with a single INCR, so every
+    old key becomes unreachable at once and is left to expire via its TTL.
+    Generations are memoised per worker for ``generation_ttl`` seconds (or
+    until an invalidation message arrives when the L1 tier is enabled).
+    """
+
+    GENERATION_KEY_PREFIX = "cache:gen"
+    TAG_NAMESPACE_PREFIX = "tag:"
+
+    def __init__(
+        self,
+        client_provider=get_redis,
+        local: LocalCache | None = None,
+        invalidation_channel: str = settings.cache_invalidation_channel,
+        namespaces: Iterable[str] = (),
+        generation_ttl: float = 1.0,
+        codec: CacheCodec | None = None,
+        tracking_prefixes: Iterable[str] = (),
+        pubsub_provider: Callable[[], Awaitable[Redis]] | None = None,
+        breaker: CircuitBreaker | None = None,
+    ):
         self._get_client = client_provider
+        # Long-lived subscriber connections; defaults to the regular client
+        self._get_pubsub_client = pubsub_provider or client_provider
+        self.breaker = breaker
+        self.codec = codec or CacheCodec()
+        self.tracking_prefixes = list(tracking_prefixes)
+        self._tracking = False
+        self.local = local
+        self.invalidation_channel = invalidation_channel
+        self.namespaces = frozenset(namespaces)
+        self.generation_ttl = generation_ttl
+        self._generations: dict[str, tuple[float, int]] = {}
+        self._origin = uuid.uuid4().hex
+
+    def _invalidation_message(
+        self, *keys: str, clear: bool = False, namespaces: Iterable[str] = ()
+    ) -> str:
+        return json.dumps(
+            {
+                "origin": self._origin,
+                "keys": list(keys),
+                "clear": clear,
+                "namespaces": list(namespaces),
+            }
+        )
+
+    def _redis_down(self) -> bool:
+        return self.breaker is not None and self.breaker.state is CircuitState.open
 
-    async def set(self, key: str, value: Any, ttl: int | None = None) -> None:
+    def _circuit(self):
+        """Fail fast (`CircuitOpenError`) while Redis is known to be down; callers fall through."""
+        return self.breaker.guard() if self.breaker is not None else nullcontext()
+
+    @property
+    def _broadcast(self) -> bool:
+        """Whether writes must announce themselves on the invalidation channel."""
+        return self.local is not None and not self._tracking
+
+    def _pipelined_broadcast(self, client: Redis) -> bool:
+        """Whether the broadcast can ride in a write pipeline (cluster pipelines reject PUBLISH)."""
+        return self._broadcast and not isinstance(client, RedisCluster)
+
+    async def _publish_invalidation(self, client: Redis, *keys: str, **kwargs: Any) -> None:
+        if self._broadcast:
+            message = self._invalidation_message(*keys, **kwargs)
+            await client.publish(self.invalidation_channel, message)
+
+    def _handle_invalidation(self, data: str | bytes) -> None:
         try:
-            client = await self._get_client()
-            payload = json.dumps(value, default=str)
-            await client.set(key, payload, ex=ttl)
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache invalidation: {data!r}")
+            return
+        if message.get("origin") == self._origin or self.local is None:
+            return
+        for namespace in message.get("namespaces", []):
+            self._generations.pop(namespace, None)
+        if message.get("clear"):
+            self.local.clear()
+        else:
+            self.local.delete(*message.get("keys", []))
+
+    async def listen_for_invalidations(self) -> None:
+        """Evict L1 entries invalidated by other workers; run as a background task."""
+        if self.local is None:
+            return
+        if self.tracking_prefixes:
+            try:
+                await self._listen_for_tracking()
+            except (ResponseError, NotImplementedError) as e:
+                logger.warning(
+                    f"Redis client tracking unavailable, using pub/sub invalidation: {e}"
+                )
+        disconnected = False
+        while True:
+            try:
+                client = await self._get_pubsub_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.invalidation_channel)
+                    if disconnected:
+                        # Anything published while disconnected is lost, so start cold.
+                        self.local.clear()
+                        self._generations.clear()
+                        disconnected = False
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._handle_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving L1 through an outage; it is cleared once resubscribed.
+                logger.warning(f"Cache invalidation listener failed: {e}")
+                disconnected = True
+                await asyncio.sleep(1)
+
+    def _handle_tracking(self, message: Any) -> None:
+        """Apply a ``__redis__:invalidate`` message; ``None`` keys mean a flush."""
+        if not isinstance(message, list) or len(message) < 3:
+            return
+        if message[0] not in (b"message", "message"):
+            return
+        keys = message[2]
+        if keys is None:
+            self.local.clear()
+            self._generations.clear()
+            return
+        generation_prefix = f"{self.GENERATION_KEY_PREFIX}:"
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            if key.startswith(generation_prefix):
+                self._generations.pop(key[len(generation_prefix):], None)
+            self.local.delete(key)
+
+    async def _listen_for_tracking(self) -> None:
+        """Server-assisted invalidation of the L1 tier (CLIENT TRACKING, BCAST mode).
+
+        Raises `ResponseError` if the server does not support tracking.
+        """
+        while True:
+            client = await self._get_pubsub_client()
+            if isinstance(client, RedisCluster):
+                raise NotImplementedError("client tracking is not supported for cluster clients")
+            connection = await client.connection_pool.get_connection()
+            try:
+                await connection.send_command("CLIENT", "ID")
+                client_id = await connection.read_response()
+                prefixes = [arg for prefix in self.tracking_prefixes for arg in ("PREFIX", prefix)]
+                await connection.send_command(
+                    "CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes
+                )
+                await connection.read_response()
+                await connection.send_command("SUBSCRIBE", "__redis__:invalidate")
+                await connection.read_response()
+                # Entries cached before tracking started were never tracked.
+                self.local.clear()
+                self._generations.clear()
+                self._tracking = True
+                while True:
+                    self._handle_tracking(await connection.read_response(timeout=None))
+            except (asyncio.CancelledError, ResponseError):
+                raise
+            except Exception as e:
+                logger.warning(f"Redis client tracking connection failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                self._tracking = False
+                await connection.disconnect()
+                await client.connection_pool.release(connection)
+
+    # ------------------------------------------------------------------
+    # Namespace generations
+    # ------------------------------------------------------------------
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.GENERATION_KEY_PREFIX}:{namespace}"
+
+    async def _generation(self, client: Redis, namespace: str) -> int:
+        now = time.monotonic()
+        memo = self._generations.get(namespace)
+        if memo is not None and memo[0] > now:
+            return memo[1]
+        generation = int(await client.get(self._generation_key(namespace)) or 0)
+        self._generations[namespace] = (now + self.generation_ttl, generation)
+        return generation
+
+    def _memoized_key(self, key: str) -> str | None:
+        """Physical key from the memoised generation, or None when Redis must be asked.
+
+        While Redis is unreachable the last known generation is used: nobody can bump
+        it meanwhile, and ``CACHE_LOCAL_TTL_SECONDS`` still bounds staleness.
+        """
+        namespace, sep, rest = key.partition(":")
+        if not sep or namespace not in self.namespaces:
+            return key
+        memo = self._generations.get(namespace)
+        if memo is None or (memo[0] <= time.monotonic() and not self._redis_down()):
+            return None
+        return f"{namespace}:v{memo[1]}:{rest}"
+
+    def _local_entry(self, key: str | None) -> CacheEntry | None:
+        """L1 lookup of a physical key (no I/O)."""
+        if self.local is None or key is None:
+            return None
+        value = self.local.get(key)
+        if value is None:
+            CACHE_REQUESTS.labels(tier="local", result="miss").inc()
+            return None
+        CACHE_REQUESTS.labels(tier="local", result="hit").inc()
+        return CacheEntry.unwrap(value)
+
+    async def _resolve(self, client: Redis, key: str) -> str:
+        """Map a logical key onto its physical (generation-prefixed) key."""
+        namespace, sep, rest = key.partition(":")
+        if not sep or namespace not in self.namespaces:
+            return key
+        return f"{namespace}:v{await self._generation(client, namespace)}:{rest}"
+
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate every key in ``namespace`` with one INCR; returns the new generation."""
+        client = await self._get_client()
+        generation = await client.incr(self._generation_key(namespace))
+        self._generations[namespace] = (time.monotonic() + self.generation_ttl, generation)
+        await self._publish_invalidation(client, namespaces=[namespace])
+        return generation
+
+    # ------------------------------------------------------------------
+    # Tags
+    # ------------------------------------------------------------------
+    async def tag_versions(self, tags: Iterable[str]) -> list[int] | None:
+        """Current version of each tag, or None when Redis is unavailable."""
+        tags = list(tags)
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                return [
+                    await self._generation(client, self.TAG_NAMESPACE_PREFIX + tag) for tag in tags
+                ]
         except Exception as e:
-            logger.warning(f"Cache set failed for key {key}: {e}")
+            _log_failure(f"Cache tag lookup failed for tags {list(tags)}", e)
+            return None
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        """Invalidate every `cached` result depending on ``tags`` (one INCR per tag)."""
+        if not tags:
+            return
+        namespaces = [self.TAG_NAMESPACE_PREFIX + tag for tag in tags]
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    for namespace in namespaces:
+                        pipe.incr(self._generation_key(namespace))
+                    generations = await pipe.execute()
+                expires = time.monotonic() + self.generation_ttl
+                for namespace, generation in zip(namespaces, generations, strict=True):
+                    self._generations[namespace] = (expires, generation)
+                await self._publish_invalidation(client, namespaces=namespaces)
+        except Exception as e:
+            _log_failure(f"Cache tag invalidation failed for tags {list(tags)}", e)
+
+    # ------------------------------------------------------------------
+    # Single keys
+    # ------------------------------------------------------------------
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int | None = None,
+        soft_ttl: float | None = None,
+        delta: float = 0.0,
+    ) -> None:
+        if soft_ttl is not None:
+            value = CacheEntry.wrap(value, soft_ttl, delta)
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                key = await self._resolve(client, key)
+                if self.local is not None:
+                    self.local.delete(key)
+                payload = self.codec.encode(value)
+                if not self._pipelined_broadcast(client):
+                    await client.set(key, payload, ex=ttl)
+                    await self._publish_invalidation(client, key)
+                else:
+                    async with client.pipeline(transaction=False) as pipe:
+                        pipe.set(key, payload, ex=ttl)
+                        pipe.publish(self.invalidation_channel, self._invalidation_message(key))
+                        await pipe.execute()
+                if self.local is not None:
+                    self.local.set(key, self.codec.decode(payload), ttl=ttl)
+        except Exception as e:
+            _log_failure(f"Cache set failed for key {key}", e)
 
     async def get(self, key: str) -> Any | None:
+        entry = await self.get_entry(key)
+        return None if entry is None else entry.value
+
+    async def get_entry(self, key: str) -> CacheEntry | None:
+        """Like `get`, but keeps the soft expiry of values stored with ``soft_ttl``."""
+        local_key = self._memoized_key(key)
+        entry = self._local_entry(local_key)
+        if entry is not None:
+            return entry
         try:
-            client = await self._get_client()
-            data = await client.get(key)
-            if data is None:
-                return None
-            return json.loads(data)
+            async with self._circuit():
+                client = await self._get_client()
+                key = await self._resolve(client, key)
+                if key != local_key:
+                    entry = self._local_entry(key)
+                    if entry is not None:
+                        return entry
+                data = await client.get(key)
+                if data is None:
+                    CACHE_REQUESTS.labels(tier="redis", result="miss").inc()
+                    return None
+                CACHE_REQUESTS.labels(tier="redis", result="hit").inc()
+                value = self.codec.decode(data)
+                if self.local is not None:
+                    self.local.set(key, value)
+                return CacheEntry.unwrap(value)
         except Exception as e:
-            logger.warning(f"Cache get failed for key {key}: {e}")
+            _log_failure(f"Cache get failed for key {key}", e)
             return None
 
     async def delete(self, key: str) -> None:
         try:
-            client = await self._get_client()
-            await client.delete(key)
+            async with self._circuit():
+                client = await self._get_client()
+                key = await self._resolve(client, key)
+                if self.local is not None:
+                    self.local.delete(key)
+                await client.delete(key)
+                await self._publish_invalidation(client, key)
         except Exception as e:
-            logger.warning(f"Cache delete failed for key {key}: {e}")
+            _log_failure(f"Cache delete failed for key {key}", e)
 
-    async def delete_pattern(self, pattern: str) -> None:
+    # ------------------------------------------------------------------
+    # Batches
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _slot_groups(client: Redis, keys: list[str]) -> list[list[str]]:
+        """Split keys into groups that a single multi-key command can serve.
+
+        Standalone Redis takes everything at once; in cluster mode keys are
+        grouped by hash slot to avoid CROSSSLOT errors.
+        """
+        if not isinstance(client, RedisCluster):
+            return [keys]
+        groups: dict[int, list[str]] = {}
+        for key in keys:
+            raw = key if isinstance(key, bytes) else key.encode()
+            groups.setdefault(key_slot(raw), []).append(key)
+        return list(groups.values())
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """Fetch several keys (MGET per slot); returns only the keys found."""
+        found: dict[str, Any] = {}
+        tried: dict[str, str | None] = {}
+        for key in dict.fromkeys(keys):
+            tried[key] = self._memoized_key(key)
+            entry = self._local_entry(tried[key])
+            if entry is not None:
+                found[key] = entry.value
+        if len(found) == len(tried):
+            return found
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                physical = {
+                    await self._resolve(client, key): key for key in tried if key not in found
+                }
+                missing = []
+                for key, logical in physical.items():
+                    entry = self._local_entry(key) if key != tried[logical] else None
+                    if entry is None:
+                        missing.append(key)
+                    else:
+                        found[logical] = entry.value
+                if not missing:
+                    return found
+                groups = self._slot_groups(client, missing)
+                results = await asyncio.gather(*(client.mget(group) for group in groups))
+                for group, values in zip(groups, results, strict=True):
+                    for key, data in zip(group, values, strict=True):
+                        if data is None:
+                            CACHE_REQUESTS.labels(tier="redis", result="miss").inc()
+                            continue
+                        CACHE_REQUESTS.labels(tier="redis", result="hit").inc()
+                        value = self.codec.decode(data)
+                        found[physical[key]] = CacheEntry.unwrap(value).value
+                        if self.local is not None:
+                            self.local.set(key, value)
+        except Exception as e:
+            _log_failure(f"Cache get_many failed for keys {keys}", e)
+        return found
+
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        ttl: int | None = None,
+        soft_ttl: float | None = None,
+        delta: float = 0.0,
+    ) -> None:
+        """Store several keys in one pipelined round trip."""
+        if not items:
+            return
+        if soft_ttl is not None:
+            items = {key: CacheEntry.wrap(value, soft_ttl, delta) for key, value in items.items()}
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                payloads = {
+                    await self._resolve(client, key): self.codec.encode(value)
+                    for key, value in items.items()
+                }
+                if self.local is not None:
+                    self.local.delete(*payloads)
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        pipe.set(key, payload, ex=ttl)
+                    if self._pipelined_broadcast(client):
+                        message = self._invalidation_message(*payloads)
+                        pipe.publish(self.invalidation_channel, message)
+                    await pipe.execute()
+                if not self._pipelined_broadcast(client):
+                    await self._publish_invalidation(client, *payloads)
+                if self.local is not None:
+                    for key, payload in payloads.items():
+                        self.local.set(key, self.codec.decode(payload), ttl=ttl)
+        except Exception as e:
+            _log_failure(f"Cache set_many failed for keys {list(items)}", e)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        """Delete several keys in one pipelined round trip (one DEL per slot)."""
+        if not keys:
+            return
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                physical = [await self._resolve(client, key) for key in keys]
+                if self.local is not None:
+                    self.local.delete(*physical)
+                async with client.pipeline(transaction=False) as pipe:
+                    for group in self._slot_groups(client, physical):
+                        pipe.delete(*group)
+                    if self._pipelined_broadcast(client):
+                        message = self._invalidation_message(*physical)
+                        pipe.publish(self.invalidation_channel, message)
+                    await pipe.execute()
+                if not self._pipelined_broadcast(client):
+                    await self._publish_invalidation(client, *physical)
+        except Exception as e:
+            _log_failure(f"Cache delete_many failed for keys {keys}", e)
+
+    # ------------------------------------------------------------------
+    # Sweeps
+    # ------------------------------------------------------------------
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Delete physical keys matching ``pattern``; returns how many were removed.
+
+        Streams the keyspace with SCAN (on every primary in cluster mode) and
+        removes matches in UNLINK batches, so Redis is never blocked by a
+        full-keyspace command. Prefer `invalidate_namespace` where possible.
+        """
         client = await self._get_client()
-        keys = await client.keys(pattern)
-        if keys:
-            await client.delete(*keys)
+        deleted = 0
+        batch: list[str] = []
+        async for key in client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await self._unlink(client, batch)
+                batch = []
+        if batch:
+            deleted += await self._unlink(client, batch)
+        if self.local is not None:
+            # The pattern cannot be mapped onto L1 keys cheaply; drop the tier.
+            self.local.clear()
+            await self._publish_invalidation(client, clear=True)
+        return deleted
+
+    async def _unlink(self, client: Redis, keys: list[str]) -> int:
+        async with client.pipeline(transaction=False) as pipe:
+            for group in self._slot_groups(client, keys):
+                pipe.unlink(*group)
+            return sum(await pipe.execute())
 
     async def flush(self) -> None:
-        client = await self._get_client()
-        await client.flushdb()
+        """Invalidate every versioned namespace and the L1 tier.
+
+        Unlike FLUSHDB this leaves unrelated data (rate limit state, locks)
+        alone; stale entries expire via their TTL.
+        """
+        for namespace in self.namespaces:
+            await self.invalidate_namespace(namespace)
+        if self.local is not None:
+            self.local.clear()
+            client = await self._get_client()
+            await self._publish_invalidation(client, clear=True)
 
 
-cache = Cache()
+cache = Cache(
+    local=LocalCache(
+        settings.redis_tracking_max_entries
+        if settings.redis_client_tracking
+        else settings.cache_local_max_entries,
+        settings.cache_local_ttl_seconds,
+    )
+    if settings.cache_local_enabled or settings.redis_client_tracking
+    else None,
+    namespaces=settings.cache_versioned_namespaces,
+    generation_ttl=settings.cache_generation_ttl_seconds,
+    codec=CacheCodec(
+        settings.cache_codec, settings.cache_compression, settings.cache_compress_threshold_bytes
+    ),
+    tracking_prefixes=settings.redis_tracking_prefixes if settings.redis_client_tracking else (),
+    pubsub_provider=redis_clients.provider("pubsub"),
+    breaker=redis_breaker,
+)
+single_flight = SingleFlight(
+    get_redis,
+    distributed=settings.cache_singleflight_distributed,
+    lock_ttl=settings.cache_singleflight_lock_ttl_seconds,
+)
+email_filter = (
+    BloomFilter(
+        get_redis,
+        "bloom:user:email",
+        capacity=settings.user_email_bloom_capacity,
+        error_rate=settings.user_email_bloom_error_rate,
+    )
+    if settings.user_email_bloom_enabled
+    else None
+)
+user_hot_keys = (
+    HotKeyTracker(
+        get_redis,
+        "hotkeys:user",
+        top_k=settings.user_hot_keys_top_k,
+        width=settings.user_hot_keys_sketch_width,
+        depth=settings.user_hot_keys_sketch_depth,
+    )
+    if settings.user_hot_keys_enabled
+    else None
+)
+principal_cache = (
+    PrincipalCache(
+        max_entries=settings.principal_cache_max_entries,
+        ttl=settings.principal_cache_ttl_seconds,
+        client_provider=get_redis,
+        channel=settings.cache_invalidation_channel,
+        pubsub_provider=redis_clients.provider("pubsub"),
+    )
+    if settings.principal_cache_enabled
+    else None
+)
+token_revocations = (
+    TokenRevocations(
+        get_redis,
+        capacity=settings.jwt_revocation_capacity,
+        error_rate=settings.jwt_revocation_error_rate,
+        sync_interval=settings.jwt_revocation_sync_interval_seconds,
+    )
+    if settings.jwt_stateless_claims
+    else None
+)
+idempotency_store = RedisIdempotencyStore(get_redis, breaker=redis_breaker)
@@ -0,0 +1,96 @@
+"""Redis-backed Bloom filter (plain SETBIT/GETBIT, no RedisBloom module needed).
+
+Usage:
+    bloom = BloomFilter(get_redis, "bloom:user:email")
+    await bloom.rebuild(stream_of_emails)
+
+    if not await bloom.might_contain(email):
+        return None  # definitely unknown
+
+A filter only answers "no" once it has been fully populated (`rebuild`
+sets a ready marker); until then, and whenever Redis fails, it answers
+"maybe" so callers fall through to the normal lookup path.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from typing import Any
+
+logger = logging.getLogger("app.cache")
+
+
+class BloomFilter:
+    def __init__(
+        self,
+        client_provider: Callable[[], Awaitable[Any]],
+        key: str,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+    ) -> None:
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("Bloom filter needs capacity > 0 and 0 < error_rate < 1")
+        self._get_client = client_provider
+        self.key = key
+        self.ready_key = f"{key}:ready"
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    async def _add(self, client: Any, items: Iterable[str]) -> None:
+        async with client.pipeline(transaction=False) as pipe:
+            for item in items:
+                for position in self._positions(item):
+                    pipe.setbit(self.key, position, 1)
+            await pipe.execute()
+
+    async def add(self, *items: str) -> None:
+        if not items:
+            return
+        try:
+            await self._add(await self._get_client(), items)
+        except Exception as e:
+            logger.warning(f"Bloom filter add failed for {self.key}: {e}")
+
+    async def might_contain(self, item: str) -> bool:
+        """False only if ``item`` was definitely never added."""
+        try:
+            client = await self._get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.exists(self.ready_key)
+                for position in self._positions(item):
+                    pipe.getbit(self.key, position)
+                ready, *bits = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Bloom filter lookup failed for {self.key}: {e}")
+            return True
+        return not ready or all(bits)
+
+    async def is_ready(self) -> bool:
+        client = await self._get_client()
+        return bool(await client.exists(self.ready_key))
+
+    async def rebuild(self, items: AsyncIterable[str], batch_size: int = 1000) -> int:
+        """Populate the filter from the source of truth and mark it ready.
+
+        Errors propagate: a partially built filter must never be marked ready.
+        """
+        client = await self._get_client()
+        await client.delete(self.ready_key)
+        count, batch = 0, []
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await self._add(client, batch)
+                count, batch = count + len(batch), []
+        if batch:
+            await self._add(client, batch)
+            count += len(batch)
+        await client.set(self.ready_key, 1)
+        return count
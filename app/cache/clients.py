@@ -0,0 +1,132 @@
+"""Named Redis connection pools, one per workload.
+
+Usage:
+    from app.cache import redis_clients
+
+    client = await redis_clients.get("limiter")
+    limiter = RateLimiter(..., client_provider=redis_clients.provider("limiter"))
+
+Each workload (``cache``, ``limiter``, ``pubsub``) gets its own client and
+bounded pool, so a burst on one cannot exhaust connections for the others.
+Pools block for up to ``timeout`` seconds when every connection is busy and
+then raise, instead of opening connections without limit. The ``pubsub``
+pool has no read timeout because its connections sit in blocking reads.
+
+Pool usage is exported as ``app_redis_pool_connections{pool, state}`` and
+``app_redis_pool_max_connections{pool}``.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app.cache.metrics import REDIS_POOL_CONNECTIONS, REDIS_POOL_MAX_CONNECTIONS
+
+# Errors meaning the server (or pool) is unavailable, as opposed to a bad command
+REDIS_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError, TimeoutError)
+
+
+@dataclass(frozen=True, slots=True)
+class PoolConfig:
+    """Limits of one named pool; see ``REDIS_POOLS`` in the settings."""
+    max_connections: int = 50
+    # Seconds to wait for a free connection before raising
+    timeout: float | None = 1.0
+    socket_connect_timeout: float | None = 1.0
+    socket_timeout: float | None = 1.0
+    health_check_interval: float = 30.0
+
+
+def _cluster_node(address: str) -> ClusterNode:
+    host, _, port = address.strip().rpartition(":")
+    return ClusterNode(host or address.strip(), int(port) if host else 6379)
+
+
+class RedisClientManager:
+    def __init__(
+        self,
+        url: str,
+        pools: Mapping[str, PoolConfig],
+        password: str | None = None,
+        cluster_nodes: str | None = None,
+    ) -> None:
+        self.url = url
+        self.pools = dict(pools)
+        self.password = password
+        self.cluster_nodes = cluster_nodes
+        self._clients: dict[str, Redis | RedisCluster] = {}
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> RedisClientManager:
+        return cls(
+            settings.redis_url,
+            {name: PoolConfig(**config) for name, config in settings.redis_pools.items()},
+            password=settings.redis_password,
+            cluster_nodes=settings.redis_cluster_nodes,
+        )
+
+    def _create(self, name: str, config: PoolConfig) -> Redis | RedisCluster:
+        REDIS_POOL_MAX_CONNECTIONS.labels(pool=name).set(config.max_connections)
+        if self.cluster_nodes:
+            # Cluster mode: the client discovers the remaining nodes from these seeds.
+            # Pools are per node there, so the cap applies per node (usage is not exported).
+            nodes = [_cluster_node(node) for node in self.cluster_nodes.split(",") if node.strip()]
+            return RedisCluster(
+                startup_nodes=nodes,
+                password=self.password,
+                max_connections=config.max_connections,
+                socket_connect_timeout=config.socket_connect_timeout,
+                socket_timeout=config.socket_timeout,
+                health_check_interval=config.health_check_interval,
+            )
+
+        pool = BlockingConnectionPool.from_url(
+            self.url,
+            password=self.password,
+            max_connections=config.max_connections,
+            timeout=config.timeout,
+            socket_connect_timeout=config.socket_connect_timeout,
+            socket_timeout=config.socket_timeout,
+            health_check_interval=config.health_check_interval,
+        )
+        REDIS_POOL_CONNECTIONS.labels(pool=name, state="in_use").set_function(
+            lambda: len(getattr(pool, "_in_use_connections", ()))
+        )
+        REDIS_POOL_CONNECTIONS.labels(pool=name, state="idle").set_function(
+            lambda: len(getattr(pool, "_available_connections", ()))
+        )
+        return Redis(connection_pool=pool)
+
+    async def get(self, name: str) -> Redis | RedisCluster:
+        """Return the lazily-created client of pool ``name``."""
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        async with self._lock:
+            if name not in self._clients:
+                if name not in self.pools:
+                    raise ValueError(f"Unknown Redis pool: {name}")
+                self._clients[name] = self._create(name, self.pools[name])
+            return self._clients[name]
+
+    def provider(self, name: str) -> Callable[[], Awaitable[Redis | RedisCluster]]:
+        """A ``client_provider`` for components that take one (Cache, RateLimiter, ...)."""
+
+        async def get_client() -> Redis | RedisCluster:
+            return await self.get(name)
+
+        return get_client
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
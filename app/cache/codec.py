@@ -0,0 +1,127 @@
+"""Binary serialisation for cached values.
+
+Payloads written by `CacheCodec` start with a two-byte header: a NUL magic
+byte followed by a format byte (serializer in the low nibble, compression in
+the high nibble). Entries written before the codec existed are plain JSON
+text, which never starts with NUL, so both can coexist in Redis while a
+rollout is in progress and any instance can read either.
+
+orjson is used for JSON when installed; msgpack, zstandard and lz4 are
+optional and only imported when a codec needs them.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MAGIC = 0x00
+
+SERIALIZERS = {"json": 0x1, "msgpack": 0x2}
+COMPRESSIONS = {None: 0x0, "zstd": 0x1, "lz4": 0x2}
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as exc:
+        raise RuntimeError("The msgpack cache codec requires the 'msgpack' package") from exc
+    return msgpack
+
+
+def _compressor(name: str):
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError("zstd cache compression requires the 'zstandard' package") from exc
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+    if name == "lz4":
+        try:
+            import lz4.frame
+        except ImportError as exc:
+            raise RuntimeError("lz4 cache compression requires the 'lz4' package") from exc
+        return lz4.frame.compress, lz4.frame.decompress
+    raise ValueError(f"Unknown cache compression: {name}")
+
+
+class CacheCodec:
+    """Encode values as tagged JSON/msgpack, compressing large payloads.
+
+    ``compression`` (``zstd`` or ``lz4``) is applied only to payloads of at
+    least ``compress_threshold`` bytes, and only when it actually shrinks them.
+    """
+
+    def __init__(
+        self,
+        serializer: str = "json",
+        compression: str | None = None,
+        compress_threshold: int = 1024,
+    ) -> None:
+        if serializer not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        if serializer == "msgpack":
+            _msgpack()
+        self._compress = _compressor(compression)[0] if compression else None
+        self._decompressors: dict[int, Any] = {}
+
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == "msgpack":
+            return _msgpack().packb(value, default=str, use_bin_type=True)
+        return _json_dumps(value)
+
+    def encode(self, value: Any) -> bytes:
+        body = self._serialize(value)
+        compression = 0x0
+        if self._compress is not None and len(body) >= self.compress_threshold:
+            compressed = self._compress(body)
+            if len(compressed) < len(body):
+                body, compression = compressed, COMPRESSIONS[self.compression]
+        return bytes((MAGIC, SERIALIZERS[self.serializer] | compression << 4)) + body
+
+    def _decompress(self, compression: int, body: bytes) -> bytes:
+        decompress = self._decompressors.get(compression)
+        if decompress is None:
+            name = next((name for name, tag in COMPRESSIONS.items() if tag == compression), None)
+            if name is None:
+                raise ValueError(f"Unknown cache compression tag: {compression:#x}")
+            decompress = self._decompressors[compression] = _compressor(name)[1]
+        return decompress(body)
+
+    def decode(self, data: bytes | str) -> Any:
+        if isinstance(data, str):
+            data = data.encode()
+        if not data or data[0] != MAGIC:
+            return _json_loads(data)  # legacy untagged JSON entry
+        if len(data) < 2:
+            raise ValueError("Truncated cache payload")
+        serializer, compression = data[1] & 0x0F, data[1] >> 4
+        body = data[2:]
+        if compression:
+            body = self._decompress(compression, body)
+        if serializer == SERIALIZERS["msgpack"]:
+            return _msgpack().unpackb(body, raw=False)
+        if serializer == SERIALIZERS["json"]:
+            return _json_loads(body)
+        raise ValueError(f"Unknown cache payload format: {data[1]:#04x}")
@@ -0,0 +1,148 @@
+"""Declarative result caching for async service and mediator methods.
+
+Usage:
+    from app.cache import cached, ModelCodec
+
+    class UserMediator:
+        @cached(ttl=60, tags=("user:{user_id}",), codec=ModelCodec(UserRead))
+        async def get_user(self, user_id: str) -> UserRead: ...
+
+    await cache.invalidate_tags("user:42")
+
+The key is a digest of the function's qualified name, its bound arguments
+(``self``/``cls`` excluded) and the current version of each tag, so
+invalidating a tag is a single INCR that makes every dependent entry
+unreachable. Tags are ``str.format`` templates over the arguments. ``None``
+results and exceptions are never cached.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Protocol, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger("app.cache")
+
+T = TypeVar("T")
+
+KEY_PREFIX = "cached"
+
+
+class ResultCodec(Protocol):
+    """Converts a result to a cacheable (JSON/msgpack compatible) value and back."""
+
+    def dump(self, value: Any) -> Any: ...
+    def load(self, data: Any) -> Any: ...
+
+
+class ModelCodec:
+    """Cache pydantic models (or any type pydantic can validate, e.g. ``list[UserRead]``)."""
+
+    def __init__(self, type_: Any) -> None:
+        self._adapter = TypeAdapter(type_)
+
+    def dump(self, value: Any) -> Any:
+        return self._adapter.dump_python(value, mode="json")
+
+    def load(self, data: Any) -> Any:
+        return self._adapter.validate_python(data)
+
+
+def _key_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    raise TypeError(f"Cannot derive a cache key from {type(value).__name__}")
+
+
+def _bound_arguments(signature: inspect.Signature, args: tuple, kwargs: dict) -> dict[str, Any]:
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    for name in ("self", "cls"):
+        arguments.pop(name, None)
+    return arguments
+
+
+def _default_backend() -> Any:
+    # app.cache imports this module, so its cache can only be looked up at call time
+    from app.cache import cache
+
+    return cache
+
+
+def cached(
+    ttl: int,
+    *,
+    tags: Iterable[str] = (),
+    codec: ResultCodec | None = None,
+    name: str | None = None,
+    backend: Any = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Cache the result of an async function for ``ttl`` seconds.
+
+    ``codec`` converts results that are not plain JSON values (see
+    `ModelCodec`). ``backend`` defaults to `app.cache.cache`, resolved on the
+    first call.
+    """
+    tag_templates = tuple(tags)
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        signature = inspect.signature(func)
+        qualname = name or f"{func.__module__}.{func.__qualname__}"
+        store = backend
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            nonlocal store
+            if store is None:
+                store = _default_backend()
+
+            try:
+                arguments = _bound_arguments(signature, args, kwargs)
+                encoded = json.dumps(
+                    arguments, sort_keys=True, separators=(",", ":"), default=_key_default
+                )
+                resolved_tags = [tag.format(**arguments) for tag in tag_templates]
+                versions = await store.tag_versions(resolved_tags)
+            except Exception as e:
+                logger.warning(f"Cache key derivation failed for {qualname}: {e}")
+                return await func(*args, **kwargs)
+            if versions is None:
+                return await func(*args, **kwargs)
+
+            material = json.dumps(
+                {"args": encoded, "tags": dict(zip(resolved_tags, versions, strict=True))},
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+            key = f"{KEY_PREFIX}:{qualname}:{hashlib.sha256(material.encode()).hexdigest()[:32]}"
+
+            data = await store.get(key)
+            if data is not None:
+                try:
+                    return codec.load(data) if codec is not None else data
+                except Exception as e:
+                    logger.warning(f"Discarding undecodable cache entry {key}: {e}")
+
+            result = await func(*args, **kwargs)
+            if result is not None:
+                await store.set(key, codec.dump(result) if codec is not None else result, ttl=ttl)
+            return result
+
+        return wrapper
+
+    return decorator
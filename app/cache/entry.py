@@ -0,0 +1,50 @@
+"""Soft-expiry envelope for cached values (stale-while-revalidate)."""
+from __future__ import annotations
+
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any
+
+ENTRY_MARKER = "__entry__"
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    """A cached value plus its soft expiry.
+
+    ``soft_expires_at`` is a wall-clock timestamp after which the value is
+    stale but still servable until the hard Redis TTL removes it. ``delta``
+    is how long the value took to compute; it scales the XFetch early
+    refresh window so expensive values are refreshed sooner.
+    """
+    value: Any
+    soft_expires_at: float | None = None
+    delta: float = 0.0
+
+    @classmethod
+    def wrap(cls, value: Any, soft_ttl: float, delta: float = 0.0) -> dict[str, Any]:
+        return {ENTRY_MARKER: [time.time() + soft_ttl, delta], "value": value}
+
+    @classmethod
+    def unwrap(cls, data: Any) -> CacheEntry:
+        if isinstance(data, dict) and ENTRY_MARKER in data:
+            soft_expires_at, delta = data[ENTRY_MARKER]
+            return cls(data.get("value"), soft_expires_at, delta)
+        return cls(data)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.soft_expires_at is not None and time.time() >= self.soft_expires_at
+
+    def should_refresh(self, beta: float = 1.0) -> bool:
+        """XFetch: refresh with rising probability as soft expiry approaches.
+
+        Each reader independently draws ``-delta * beta * ln(U)``, which spreads
+        refreshes out instead of letting every worker hit the cliff at once.
+        """
+        if self.soft_expires_at is None:
+            return False
+        jitter = -self.delta * beta * math.log(random.random() or 1e-12)
+        return time.time() + jitter >= self.soft_expires_at
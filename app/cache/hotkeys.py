@@ -0,0 +1,162 @@
+"""Access-frequency tracking for cache keys (count-min sketch + top-K).
+
+Usage:
+    from app.cache import user_hot_keys
+
+    user_hot_keys.record(user_id)        # on every lookup, no I/O
+    user_hot_keys.top(100)               # this worker's hottest items
+    await user_hot_keys.flush()          # publish the top-K to Redis
+    await user_hot_keys.load(100)        # shared hot set, e.g. after a restart
+
+Counting is in-process and constant memory: a ``depth x width`` count-min
+sketch over-estimates by at most ``e / width`` of the total count with
+probability ``1 - exp(-depth)``. `decay` halves every counter so the hot
+set follows shifting traffic. `flush` adds what each top-K item gained since
+the previous flush to a Redis sorted set (ZINCRBY), so the shared scores sum
+every worker's traffic; the set survives deploys and lets a cold worker know
+what to warm.
+
+The top-K is a dict of counts plus a min-heap with lazy deletion: an update
+pushes a new entry and outdated ones are dropped when they surface, so a
+record costs O(log K). The heap is rebuilt once it holds twice K entries.
+"""
+from __future__ import annotations
+
+import hashlib
+import heapq
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger("app.cache")
+
+
+class HotKeyTracker:
+    def __init__(
+        self,
+        client_provider: Callable[[], Awaitable[Any]],
+        key: str,
+        top_k: int = 1000,
+        width: int = 4096,
+        depth: int = 4,
+        ttl: int = 86_400,
+    ) -> None:
+        if top_k <= 0 or width <= 0 or depth <= 0:
+            raise ValueError("Hot key tracker needs top_k, width and depth > 0")
+        self._get_client = client_provider
+        self.key = key
+        self.top_k = top_k
+        self.width = width
+        self.depth = depth
+        self.ttl = ttl
+        self._rows = [[0] * width for _ in range(depth)]
+        self._top: dict[str, int] = {}
+        self._heap: list[tuple[int, str]] = []
+        self._flushed: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._top)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def estimate(self, item: str) -> int:
+        positions = self._positions(item)
+        return min(row[position] for row, position in zip(self._rows, positions, strict=True))
+
+    def record(self, item: str, count: int = 1) -> int:
+        """Count an access to ``item``; returns its estimated frequency."""
+        estimate = None
+        for row, position in zip(self._rows, self._positions(item), strict=True):
+            row[position] += count
+            estimate = row[position] if estimate is None else min(estimate, row[position])
+
+        if item in self._top or len(self._top) < self.top_k:
+            if self._top.get(item) != estimate:
+                self._top[item] = estimate
+                self._push(estimate, item)
+        elif estimate > self._coldest():
+            _, coldest = heapq.heappop(self._heap)
+            del self._top[coldest]
+            self._top[item] = estimate
+            self._push(estimate, item)
+        return estimate
+
+    def _push(self, count: int, item: str) -> None:
+        heapq.heappush(self._heap, (count, item))
+        if len(self._heap) > 2 * self.top_k:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._heap = [(count, item) for item, count in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def _coldest(self) -> int:
+        """Smallest tracked count, dropping outdated heap entries on the way."""
+        while self._heap:
+            count, item = self._heap[0]
+            if self._top.get(item) == count:
+                return count
+            heapq.heappop(self._heap)
+        return 0
+
+    def top(self, limit: int | None = None) -> list[tuple[str, int]]:
+        """This worker's hottest items, most frequent first."""
+        ranked = sorted(self._top.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked[:limit] if limit is not None else ranked
+
+    def decay(self) -> None:
+        """Halve every counter so old popularity fades."""
+        for row in self._rows:
+            for position, value in enumerate(row):
+                row[position] = value >> 1
+        self._top = {item: count >> 1 for item, count in self._top.items() if count > 1}
+        self._flushed = {item: count >> 1 for item, count in self._flushed.items() if count > 1}
+        self._rebuild()
+
+    async def flush(self) -> None:
+        """Add this worker's top-K counts since the last flush to the shared sorted set."""
+        deltas = {
+            item: count - self._flushed.get(item, 0)
+            for item, count in self._top.items()
+            if count > self._flushed.get(item, 0)
+        }
+        if not deltas:
+            return
+        try:
+            client = await self._get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for item, delta in deltas.items():
+                    pipe.zincrby(self.key, delta, item)
+                pipe.zremrangebyrank(self.key, 0, -self.top_k - 1)
+                pipe.expire(self.key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Hot key flush failed for {self.key}: {e}")
+            return
+        self._flushed = dict(self._top)
+
+    async def claim(self, ttl: float) -> bool:
+        """Elect one worker for a periodic job on the hot set (SET NX for ``ttl`` seconds)."""
+        try:
+            client = await self._get_client()
+            return bool(await client.set(f"{self.key}:leader", 1, nx=True, px=int(ttl * 1000)))
+        except Exception as e:
+            logger.warning(f"Hot key leader election failed for {self.key}: {e}")
+            return False
+
+    async def load(self, limit: int | None = None) -> list[tuple[str, int]]:
+        """The shared hot set written by every worker's `flush`, most frequent first."""
+        limit = self.top_k if limit is None else limit
+        try:
+            client = await self._get_client()
+            entries = await client.zrevrange(self.key, 0, limit - 1, withscores=True)
+        except Exception as e:
+            logger.warning(f"Hot key load failed for {self.key}: {e}")
+            return []
+        return [
+            (item.decode() if isinstance(item, bytes) else item, int(score))
+            for item, score in entries
+        ]
@@ -0,0 +1,201 @@
+"""Stored responses for ``Idempotency-Key`` requests.
+
+Usage:
+    store = RedisIdempotencyStore(get_redis)      # or LocalIdempotencyStore() in tests
+
+    if await store.acquire(key, lock_ttl):
+        ...run the request...
+        await store.save(key, StoredResponse(...), ttl)   # or release(key) to allow a retry
+    else:
+        stored = await store.wait(key, timeout)           # the first request's response, if any
+
+Only one request per key runs at a time: ``acquire`` takes a short lock that
+``save`` or ``release`` gives back. Duplicates on the same worker wait on the
+in-flight request directly; duplicates on other workers poll Redis.
+
+With a ``breaker`` (`redis_breaker` in the app), every Redis call goes
+through it: while the circuit is open the store raises `CircuitOpenError`
+at once instead of waiting out socket timeouts, and the middleware runs the
+request without idempotency, as it does for any store failure.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from app.cache.keys import make_key
+from app.core.circuit_breaker import CircuitBreaker
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    fingerprint: str
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "fingerprint": self.fingerprint,
+                "status": self.status,
+                "headers": self.headers,
+                "body": base64.b64encode(self.body).decode(),
+            }
+        )
+
+    @classmethod
+    def loads(cls, raw: str | bytes) -> StoredResponse:
+        data = json.loads(raw)
+        return cls(
+            fingerprint=data["fingerprint"],
+            status=data["status"],
+            headers=[(name, value) for name, value in data["headers"]],
+            body=base64.b64decode(data["body"]),
+        )
+
+
+class IdempotencyStore(Protocol):
+    async def get(self, key: str) -> StoredResponse | None: ...
+    async def acquire(self, key: str, ttl: float) -> bool: ...
+    async def save(self, key: str, response: StoredResponse, ttl: float) -> None: ...
+    async def release(self, key: str) -> None: ...
+    async def wait(self, key: str, timeout: float) -> StoredResponse | None: ...
+
+
+async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except TimeoutError:
+        pass
+
+
+class LocalIdempotencyStore:
+    """In-process store for tests and single-worker development."""
+
+    def __init__(self) -> None:
+        self._responses: dict[str, tuple[float, StoredResponse]] = {}
+        self._inflight: dict[str, asyncio.Event] = {}
+
+    async def get(self, key: str) -> StoredResponse | None:
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._responses[key]
+            return None
+        return response
+
+    async def acquire(self, key: str, ttl: float) -> bool:
+        if key in self._inflight:
+            return False
+        self._inflight[key] = asyncio.Event()
+        return True
+
+    async def save(self, key: str, response: StoredResponse, ttl: float) -> None:
+        self._responses[key] = (time.monotonic() + ttl, response)
+        await self.release(key)
+
+    async def release(self, key: str) -> None:
+        event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, key: str, timeout: float) -> StoredResponse | None:
+        event = self._inflight.get(key)
+        if event is not None:
+            await _wait_event(event, timeout)
+        return await self.get(key)
+
+
+class RedisIdempotencyStore:
+    def __init__(
+        self,
+        client_provider: Callable[[], Awaitable[Any]],
+        prefix: str = "idempotency",
+        poll_interval: float = 0.05,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self._get_client = client_provider
+        self.prefix = prefix
+        self.poll_interval = poll_interval
+        self.breaker = breaker
+        self._inflight: dict[str, asyncio.Event] = {}
+
+    def _circuit(self):
+        """Fail fast (`CircuitOpenError`) while Redis is known to be down."""
+        return self.breaker.guard() if self.breaker is not None else nullcontext()
+
+    # Hash-tagged so the response and its lock share a cluster slot
+    def _key(self, key: str) -> str:
+        return make_key(self.prefix, tag=key)
+
+    def _lock_key(self, key: str) -> str:
+        return make_key(self.prefix, "lock", tag=key)
+
+    async def get(self, key: str) -> StoredResponse | None:
+        async with self._circuit():
+            client = await self._get_client()
+            raw = await client.get(self._key(key))
+        return None if raw is None else StoredResponse.loads(raw)
+
+    async def acquire(self, key: str, ttl: float) -> bool:
+        async with self._circuit():
+            client = await self._get_client()
+            acquired = await client.set(self._lock_key(key), 1, nx=True, px=max(int(ttl * 1000), 1))
+        if not acquired:
+            return False
+        self._inflight[key] = asyncio.Event()
+        return True
+
+    async def save(self, key: str, response: StoredResponse, ttl: float) -> None:
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.set(self._key(key), response.dumps(), px=max(int(ttl * 1000), 1))
+                    pipe.delete(self._lock_key(key))
+                    await pipe.execute()
+        finally:
+            self._set_done(key)
+
+    async def release(self, key: str) -> None:
+        try:
+            async with self._circuit():
+                client = await self._get_client()
+                await client.delete(self._lock_key(key))
+        finally:
+            self._set_done(key)
+
+    def _set_done(self, key: str) -> None:
+        event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, key: str, timeout: float) -> StoredResponse | None:
+        """Wait for the in-flight request; None if it released the key or ``timeout`` passed."""
+        event = self._inflight.get(key)
+        if event is not None:
+            await _wait_event(event, timeout)
+            return await self.get(key)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            async with self._circuit():
+                client = await self._get_client()
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.get(self._key(key))
+                    pipe.exists(self._lock_key(key))
+                    raw, locked = await pipe.execute()
+            if raw is not None:
+                return StoredResponse.loads(raw)
+            if not locked or time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,32 @@
+"""Redis key construction with cluster hash tags.
+
+Usage:
+    from app.cache.keys import make_key
+
+    make_key("user", tag=user_id)                # user:{42}
+    make_key("user", "email", tag=email)         # user:email:{a@example.com}
+    make_key("rate_limit", "gcra", tag=client)   # rate_limit:gcra:{1.2.3.4}
+
+Redis Cluster hashes only the part of a key between the first ``{`` and the
+following ``}``, so every key built with the same ``tag`` maps to the same
+slot. Multi-key commands, pipelines and Lua scripts over such keys therefore
+work in cluster mode, and the namespace generation prefix inserted by
+`Cache` (``user:v3:{42}``) keeps the tag intact. On a standalone server the
+braces are just part of the key name.
+"""
+from __future__ import annotations
+
+SEPARATOR = ":"
+
+
+def hash_tag(value: object) -> str:
+    """Wrap ``value`` so that it alone decides the key's cluster slot."""
+    return f"{{{value}}}"
+
+
+def make_key(*parts: object, tag: object | None = None) -> str:
+    """Join ``parts`` with ``:``, appending ``tag`` as a hash-tagged last segment."""
+    segments = [str(part) for part in parts]
+    if tag is not None:
+        segments.append(hash_tag(tag))
+    return SEPARATOR.join(segments)
@@ -0,0 +1,65 @@
+"""Bounded in-process LRU/TTL store used as the L1 tier in front of Redis."""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Least-recently-used mapping whose entries also expire after a TTL.
+
+    Values are stored as-is (already decoded), so callers must treat what
+    they get back as read-only. ``on_evict(key, value)`` runs whenever an
+    entry is dropped by expiry, size or `delete` (not by `clear`).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: float = 5.0,
+        on_evict: Callable[[str, Any], None] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._evicted(key, value)
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest, (_, dropped) = self._entries.popitem(last=False)
+            self._evicted(oldest, dropped)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            entry = self._entries.pop(key, _MISSING)
+            if entry is not _MISSING:
+                self._evicted(key, entry[1])
+
+    def _evicted(self, key: str, value: Any) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,22 @@
+"""Prometheus metrics for the cache layer."""
+from __future__ import annotations
+
+from prometheus_client import Counter, Gauge
+
+CACHE_REQUESTS = Counter(
+    "app_cache_requests_total",
+    "Cache lookups by tier and outcome.",
+    ["tier", "result"],
+)
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    "app_redis_pool_connections",
+    "Connections of each named Redis pool by state (in_use, idle).",
+    ["pool", "state"],
+)
+
+REDIS_POOL_MAX_CONNECTIONS = Gauge(
+    "app_redis_pool_max_connections",
+    "Connection cap of each named Redis pool.",
+    ["pool"],
+)
@@ -0,0 +1,134 @@
+"""Per-worker cache of verified bearer tokens.
+
+Usage:
+    principal = principals.get(token)
+    if principal is None:
+        principal = verify(token)
+        principals.set(token, principal.user_id, principal, expires_at=claims["exp"])
+
+    await principals.evict_user(user_id)      # after any write to the user
+
+Entries are keyed by a SHA-256 digest of the token (the token itself is never
+stored) and live for at most ``ttl`` seconds, never past the token's ``exp``.
+A hit skips both the signature check and the user lookup, so writes to a user
+must call ``evict_user``. Given a client, it publishes the eviction on the
+cache invalidation channel, and workers running `listen_for_evictions` drop
+the user's tokens as well. ``ttl`` bounds staleness when a message is lost.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.cache.local import LocalCache
+
+logger = logging.getLogger("app.cache")
+
+
+class PrincipalCache:
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: float = 15.0,
+        client_provider: Callable[[], Awaitable[Any]] | None = None,
+        channel: str | None = None,
+        pubsub_provider: Callable[[], Awaitable[Any]] | None = None,
+    ) -> None:
+        self._entries = LocalCache(max_entries=max_entries, ttl=ttl, on_evict=self._unindex)
+        self._by_user: dict[str, set[str]] = {}
+        self._get_client = client_provider
+        self._get_pubsub_client = pubsub_provider or client_provider
+        self.channel = channel
+        self._origin = uuid.uuid4().hex
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _unindex(self, digest: str, entry: tuple[str, Any]) -> None:
+        digests = self._by_user.get(entry[0])
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[entry[0]]
+
+    def get(self, token: str) -> Any | None:
+        entry = self._entries.get(self.digest(token))
+        return None if entry is None else entry[1]
+
+    def set(
+        self, token: str, user_id: str, principal: Any, expires_at: float | None = None
+    ) -> None:
+        """Cache ``principal`` for ``token``; ``expires_at`` is the token's ``exp`` (epoch)."""
+        ttl = None
+        if expires_at is not None:
+            ttl = expires_at - time.time()
+            if ttl <= 0:
+                return
+        digest = self.digest(token)
+        self._entries.set(digest, (user_id, principal), ttl=ttl)
+        self._by_user.setdefault(user_id, set()).add(digest)
+
+    def _evict_local(self, user_id: str) -> int:
+        digests = self._by_user.pop(user_id, set())
+        self._entries.delete(*digests)
+        return len(digests)
+
+    async def evict_user(self, user_id: str) -> int:
+        """Drop every cached token of the user here and on other workers.
+
+        Returns how many were removed on this worker.
+        """
+        removed = self._evict_local(user_id)
+        if self._get_client is not None and self.channel:
+            message = json.dumps({"origin": self._origin, "principals": [user_id]})
+            try:
+                client = await self._get_client()
+                await client.publish(self.channel, message)
+            except Exception as e:
+                logger.warning(f"Principal eviction broadcast failed for user {user_id}: {e}")
+        return removed
+
+    def _handle_eviction(self, data: str | bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return
+        # Cache invalidations share the channel and carry no "principals"
+        if not isinstance(message, dict) or message.get("origin") == self._origin:
+            return
+        for user_id in message.get("principals", []):
+            self._evict_local(user_id)
+
+    async def listen_for_evictions(self) -> None:
+        """Apply evictions published by other workers; run as a background task."""
+        if self._get_pubsub_client is None or not self.channel:
+            return
+        while True:
+            try:
+                client = await self._get_pubsub_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._handle_eviction(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Evictions published while disconnected are lost, so start cold
+                logger.warning(f"Principal eviction listener failed: {e}")
+                self.clear()
+                await asyncio.sleep(1)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
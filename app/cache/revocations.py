@@ -0,0 +1,137 @@
+"""Per-user token versions with an in-memory Bloom filter of revoked users.
+
+Usage:
+    version = await revocations.current_version(user_id)   # claim "ver" at login
+    await revocations.revoke(user_id)                      # invalidates older tokens
+
+    if not await revocations.is_current(user_id, claims["ver"]):
+        raise UnauthorizedError(...)
+
+The authoritative version lives in Redis (``token_version:{id}``), and every
+revoked user is added to a Redis bitmap Bloom filter. Each worker keeps a copy
+of that bitmap, refreshed every ``sync_interval`` seconds. A token whose user
+is not in the local copy is current without touching Redis. Only users that
+were ever revoked (or false positives) pay one GET for the version.
+
+Until the first sync succeeds every user counts as possibly revoked. Revocations
+from other workers reach this one within ``sync_interval``.
+
+If a revocation cannot be stored it is kept and retried on every sync. While
+one is pending, or the last successful sync is older than ``max_staleness``,
+``is_stale()`` is true and callers should not trust claims in stateless tokens.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.cache.bloom import BloomFilter
+from app.cache.keys import make_key
+
+logger = logging.getLogger("app.cache")
+
+
+class TokenRevocations:
+    def __init__(
+        self,
+        client_provider: Callable[[], Awaitable[Any]],
+        key: str = "bloom:auth:revoked",
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+        sync_interval: float = 5.0,
+        max_staleness: float | None = None,
+    ) -> None:
+        self._get_client = client_provider
+        self.filter = BloomFilter(client_provider, key, capacity=capacity, error_rate=error_rate)
+        self.sync_interval = sync_interval
+        self.max_staleness = 3 * sync_interval if max_staleness is None else max_staleness
+        self._bits = bytearray((self.filter.size + 7) // 8)
+        self._synced_at: float | None = None
+        self._pending: set[str] = set()
+
+    @staticmethod
+    def _version_key(user_id: str) -> str:
+        return make_key("token_version", tag=user_id)
+
+    def _set_local(self, item: str) -> None:
+        # Same bit order as Redis SETBIT: offset 0 is the high bit of the first byte
+        for position in self.filter._positions(item):
+            self._bits[position >> 3] |= 0x80 >> (position & 7)
+
+    def maybe_revoked(self, user_id: str) -> bool:
+        """False only if the user was definitely never revoked (as of the last sync)."""
+        if self._synced_at is None:
+            return True
+        return all(
+            self._bits[position >> 3] & (0x80 >> (position & 7))
+            for position in self.filter._positions(user_id)
+        )
+
+    async def current_version(self, user_id: str) -> int | None:
+        """Version to embed in new tokens; None when Redis is unavailable."""
+        try:
+            client = await self._get_client()
+            return int(await client.get(self._version_key(user_id)) or 0)
+        except Exception as e:
+            logger.warning(f"Token version lookup failed for user {user_id}: {e}")
+            return None
+
+    def is_stale(self) -> bool:
+        """True while a revocation is unstored or the local copy is older than ``max_staleness``."""
+        if self._pending or self._synced_at is None:
+            return True
+        return time.monotonic() - self._synced_at > self.max_staleness
+
+    async def is_current(self, user_id: str, version: int) -> bool:
+        """Whether a token issued at ``version`` is still valid (fails closed)."""
+        if not self.maybe_revoked(user_id):
+            return True
+        current = await self.current_version(user_id)
+        return current is not None and version >= current
+
+    async def _store(self, client: Any, user_id: str) -> int:
+        version = await client.incr(self._version_key(user_id))
+        await self.filter._add(client, [user_id])
+        return int(version)
+
+    async def revoke(self, user_id: str) -> int:
+        """Invalidate every token issued so far for the user; returns the new version.
+
+        On failure the revocation is kept for the next sync to retry, and the
+        error is raised.
+        """
+        self._set_local(user_id)
+        try:
+            client = await self._get_client()
+            version = await self._store(client, user_id)
+        except Exception:
+            self._pending.add(user_id)
+            raise
+        self._pending.discard(user_id)
+        return version
+
+    async def sync(self) -> None:
+        """Store pending revocations, then replace the local copy with the Redis bitmap."""
+        client = await self._get_client()
+        for user_id in list(self._pending):
+            await self._store(client, user_id)
+            self._pending.discard(user_id)
+        raw = await client.get(self.filter.key) or b""
+        bits = bytearray(raw[: len(self._bits)])
+        bits.extend(bytes(len(self._bits) - len(bits)))
+        self._bits = bits
+        for user_id in self._pending:   # failed while the bitmap was being fetched
+            self._set_local(user_id)
+        self._synced_at = time.monotonic()
+
+    async def run_sync(self) -> None:
+        """Sync now and then every ``sync_interval``; run as a background task."""
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Token revocation sync failed: {e}")
+            await asyncio.sleep(self.sync_interval)
@@ -0,0 +1,150 @@
+"""Request coalescing for cache misses.
+
+Usage:
+    from app.cache import single_flight
+
+    user = await single_flight.do("user:42", load_user, recheck=read_cache)
+
+Concurrent calls for the same key within a worker await a single loader and
+share its result (or exception). With ``distributed=True`` the leader also
+takes a short Redis lock, so leaders on other workers wait for the first
+one to fill the cache (polling ``recheck``) instead of loading in parallel.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+logger = logging.getLogger("app.cache")
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        client_provider: Callable[[], Awaitable[Any]] | None = None,
+        distributed: bool = False,
+        lock_ttl: float = 5.0,
+        wait_timeout: float = 2.0,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self._get_client = client_provider
+        self.distributed = distributed and client_provider is not None
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._background: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    def spawn(self, key: str, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task | None:
+        """Run ``loader`` in the background unless ``key`` is already in flight.
+
+        Used for stale-while-revalidate refreshes: the caller keeps serving
+        the stale value and at most one refresh per key runs per worker.
+        """
+        if key in self._inflight:
+            return None
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+
+        async def run() -> None:
+            try:
+                await self._run(key, future, loader, None)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for key {key}: {e}")
+
+        task = asyncio.create_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def do(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        recheck: Callable[[], Awaitable[T | None]] | None = None,
+    ) -> T:
+        """Run ``loader`` once for all concurrent callers of ``key``."""
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Retry only when the leader was cancelled, not this caller.
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        return await self._run(key, future, loader, recheck)
+
+    async def _run(
+        self,
+        key: str,
+        future: asyncio.Future,
+        loader: Callable[[], Awaitable[T]],
+        recheck: Callable[[], Awaitable[T | None]] | None,
+    ) -> T:
+        try:
+            result = await self._lead(key, loader, recheck)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody is waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _lead(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        recheck: Callable[[], Awaitable[T | None]] | None,
+    ) -> T:
+        if not self.distributed:
+            return await loader()
+
+        try:
+            client = await self._get_client()
+            lock = client.lock(f"lock:{key}", timeout=self.lock_ttl, blocking=False)
+            acquired = await lock.acquire()
+        except Exception as e:
+            logger.warning(f"Single-flight lock failed for key {key}: {e}")
+            return await loader()
+
+        if acquired:
+            try:
+                return await loader()
+            finally:
+                try:
+                    await lock.release()
+                except Exception as e:
+                    logger.warning(f"Single-flight unlock failed for key {key}: {e}")
+
+        # Another worker is loading: wait for it to fill the cache.
+        deadline = time.monotonic() + self.wait_timeout
+        while recheck is not None and time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                released = not await lock.locked()
+            except Exception:
+                released = True
+            value = await recheck()
+            if value is not None or released:
+                break
+        else:
+            value = None
+        return value if value is not None else await loader()
+
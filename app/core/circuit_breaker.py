@@ -0,0 +1,200 @@
+"""Async circuit breaker for external dependencies (Redis, Postgres, RabbitMQ).
+
+Usage:
+    from app.core.circuit_breaker import get_breaker
+
+    breaker = get_breaker("redis")
+    if not breaker.allow():
+        return fallback()
+    async with breaker.guard(): ...      # raises CircuitOpenError when open
+
+After ``failure_threshold`` consecutive failures the circuit opens and calls
+fail fast for ``recovery_seconds``. It then lets ``half_open_max_calls``
+probe calls through: one success closes it again, a failure reopens it.
+Only ``expected`` exceptions count as failures; any other outcome (including
+application errors such as an IntegrityError) proves the dependency answered.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from enum import StrEnum
+from typing import Any, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+
+T = TypeVar("T")
+
+CIRCUIT_STATE = Gauge(
+    "app_circuit_breaker_state",
+    "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open).",
+    ["name"],
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "app_circuit_breaker_transitions_total",
+    "Circuit breaker state changes per dependency.",
+    ["name", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "app_circuit_breaker_rejections_total",
+    "Calls short-circuited while the circuit was open.",
+    ["name"],
+)
+
+
+class CircuitState(StrEnum):
+    closed = "closed"
+    half_open = "half_open"
+    open = "open"
+
+
+_STATE_VALUES = {CircuitState.closed: 0, CircuitState.half_open: 1, CircuitState.open: 2}
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    code = "circuit_open"
+
+    def __init__(self, name: str, retry_after: float = 0.0) -> None:
+        super().__init__(message=f"{name} is unavailable", details={"retry_after": retry_after})
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        expected: tuple[type[BaseException], ...] = (Exception,),
+    ) -> None:
+        if failure_threshold <= 0 or half_open_max_calls <= 0:
+            raise ValueError("Circuit breaker needs failure_threshold and half_open_max_calls > 0")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.expected = expected
+        self._state = CircuitState.closed
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        CIRCUIT_STATE.labels(name=name).set(0)
+
+    def _transition(self, state: CircuitState) -> None:
+        if state is self._state:
+            return
+        self._state = state
+        self._probes = 0
+        if state is CircuitState.open:
+            self._opened_at = time.monotonic()
+        CIRCUIT_STATE.labels(name=self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(name=self.name, state=state.value).inc()
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.open and self.retry_after <= 0:
+            self._transition(CircuitState.half_open)
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        if self._state is not CircuitState.open:
+            return 0.0
+        return max(self._opened_at + self.recovery_seconds - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now (reserves a probe slot when half-open)."""
+        state = self.state
+        if state is CircuitState.closed:
+            return True
+        if state is CircuitState.half_open and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        CIRCUIT_REJECTIONS.labels(name=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        # A call admitted before the circuit opened must not close it again
+        if self._state is CircuitState.open:
+            return
+        self._failures = 0
+        self._transition(CircuitState.closed)
+
+    def record_failure(self) -> None:
+        if self._state is CircuitState.open:
+            return
+        if self._state is CircuitState.half_open:
+            self._transition(CircuitState.open)
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._failures = 0
+            self._transition(CircuitState.open)
+
+    def release(self) -> None:
+        """Give back a probe slot reserved by `allow` for a call that never ran."""
+        if self._state is CircuitState.half_open:
+            self._probes = max(self._probes - 1, 0)
+
+    def record(self, error: BaseException | None) -> None:
+        """Record the outcome of an allowed call; only ``expected`` errors are failures."""
+        if error is not None and isinstance(error, self.expected):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    @asynccontextmanager
+    async def observe(self) -> AsyncIterator[None]:
+        """Record the outcome of a block already admitted by `allow`."""
+        try:
+            yield
+        except Exception as exc:
+            self.record(exc)
+            raise
+        except BaseException:
+            # Cancelled: the dependency never answered either way
+            self.release()
+            raise
+        else:
+            self.record_success()
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run the block through the breaker; raises `CircuitOpenError` when open."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after)
+        async with self.observe():
+            yield
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        fallback: Callable[[], Awaitable[T]] | None = None,
+    ) -> T:
+        """``await func()`` through the breaker, using ``fallback`` while the circuit is open."""
+        if not self.allow():
+            if fallback is None:
+                raise CircuitOpenError(self.name, self.retry_after)
+            return await fallback()
+        async with self.observe():
+            return await func()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **defaults: Any) -> CircuitBreaker:
+    """Shared breaker for dependency ``name``, configured by ``CIRCUIT_BREAKERS``."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        options = {**defaults, **settings.circuit_breakers.get(name, {})}
+        breaker = _breakers[name] = CircuitBreaker(name, **options)
+    return breaker
@@ -18,6 +18,12 @@ class AppError(Exception):
         self.details = details
 
 
+class BadRequestError(AppError):
+    code = "bad_request"
+    status_code = 400
+    message = "Bad request"
+
+
 class NotFoundError(AppError):
     code = "not_found"
     status_code = 404
@@ -42,6 +48,12 @@ class ForbiddenError(AppError):
     message = "Forbidden"
 
 
+class ServiceUnavailableError(AppError):
+    code = "service_unavailable"
+    status_code = 503
+    message = "Service unavailable"
+
+
 def register_error_handlers(app: FastAPI) -> None:
     @app.exception_handler(AppError)
     async def app_error_handler(request: Request, exc: AppError) -> JSONResponse:
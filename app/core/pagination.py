@@ -0,0 +1,30 @@
+"""Opaque cursor tokens for keyset pagination.
+
+A cursor is the sort key of the last row of a page, as URL-safe base64 JSON.
+Clients must treat it as opaque; a malformed one is a 400.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import Any
+
+from app.core.errors import BadRequestError
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, size: int) -> list[Any]:
+    """Sort key values from ``token``; raises `BadRequestError` unless there are ``size``."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError) as exc:
+        raise BadRequestError(message="Invalid cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise BadRequestError(message="Invalid cursor")
+    return values
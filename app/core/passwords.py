@@ -0,0 +1,159 @@
+"""Password hashing off the event loop.
+
+Usage:
+    from app.core.passwords import password_hasher
+
+    hashed = await password_hasher.hash(password)
+    valid, new_hash = await password_hasher.verify_and_update(password, hashed)
+
+Hashes run in a bounded thread pool (PBKDF2 and bcrypt release the GIL), so a
+login no longer stalls every other request on the worker. At most
+``PASSWORD_HASH_MAX_PENDING`` operations may be queued or running; beyond that
+callers get a 503 instead of an ever-growing queue.
+
+``verify_and_update`` returns a replacement hash when the stored one uses a
+deprecated scheme or fewer than ``PASSWORD_HASH_ROUNDS`` rounds. Pick the
+rounds for the production hardware with:
+
+    python -m app.core.passwords --target-ms 250
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+
+T = TypeVar("T")
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "app_password_hash_seconds",
+    "Time spent hashing or verifying a password in the executor.",
+    ["operation"],
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "app_password_hash_pending",
+    "Password hash operations queued or running.",
+)
+PASSWORD_HASH_REJECTIONS = Counter(
+    "app_password_hash_rejections_total",
+    "Password hash operations rejected because the queue was full.",
+)
+
+DEFAULT_SCHEME = "pbkdf2_sha256"
+
+
+def build_context(rounds: int) -> CryptContext:
+    """Hashes with ``rounds`` PBKDF2 rounds; weaker or legacy hashes need an update."""
+    return CryptContext(
+        schemes=[DEFAULT_SCHEME, "bcrypt_sha256", "bcrypt"],
+        default=DEFAULT_SCHEME,
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+    )
+
+
+class PasswordBusyError(ServiceUnavailableError):
+    code = "password_hashing_busy"
+    message = "Too many concurrent logins, retry shortly"
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, max_workers: int = 4, max_pending: int = 64) -> None:
+        if max_workers <= 0 or max_pending <= 0:
+            raise ValueError("Password hasher needs max_workers and max_pending > 0")
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    def _timed(self, operation: str, func: Callable[..., T], *args) -> Callable[[], T]:
+        def run() -> T:
+            with PASSWORD_HASH_SECONDS.labels(operation=operation).time():
+                return func(*args)
+
+        return run
+
+    async def _run(self, operation: str, func: Callable[..., T], *args) -> T:
+        if self._pending >= self.max_pending:
+            PASSWORD_HASH_REJECTIONS.inc()
+            raise PasswordBusyError()
+
+        self._pending += 1
+        PASSWORD_HASH_PENDING.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), self._timed(operation, func, *args)
+            )
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_PENDING.dec()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """Verify, returning a new hash when ``hashed`` is outdated (None otherwise)."""
+        return await self._run("verify", self.context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def calibrate(target_ms: float, samples: int = 5, min_rounds: int = 10_000) -> int:
+    """PBKDF2 rounds for which one hash takes about ``target_ms`` on this machine."""
+    rounds = min_rounds
+    for _ in range(2):   # the second pass corrects for fixed per-hash overhead
+        context = build_context(rounds)
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            context.hash("calibration-password")
+            timings.append(time.perf_counter() - started)
+        elapsed_ms = sorted(timings)[len(timings) // 2] * 1000
+        rounds = max(int(rounds * target_ms / elapsed_ms), min_rounds)
+    return rounds
+
+
+password_hasher = PasswordHasher(
+    build_context(settings.password_hash_rounds),
+    max_workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pick PBKDF2 rounds for a target hash latency.")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args()
+
+    rounds = calibrate(args.target_ms, samples=args.samples)
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()
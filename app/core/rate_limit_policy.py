@@ -0,0 +1,112 @@
+"""Per-route rate limit policies and the path matcher that selects them."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Literal
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitPolicy:
+    """Budget applied to requests whose path matches ``path``.
+
+    ``path`` is a route template such as ``/api/v1/users/{user_id}``.
+    ``methods`` restricts the policy to those HTTP methods (all when empty).
+    ``key`` chooses the bucket: ``ip`` for the client address, ``user`` for
+    the JWT subject (falling back to the address for anonymous requests).
+    Exempt policies bypass rate limiting entirely.
+    """
+    name: str
+    path: str
+    max_requests: int = 0
+    window_seconds: int = 60
+    methods: tuple[str, ...] = ()
+    key: Literal["ip", "user"] = "ip"
+    exempt: bool = False
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "methods", tuple(m.upper() for m in self.methods))
+        if self.key not in ("ip", "user"):
+            raise ValueError(f"Unknown rate limit key for policy {self.name}: {self.key}")
+        if not self.exempt and self.max_requests <= 0:
+            raise ValueError(f"Rate limit policy {self.name} needs max_requests > 0")
+
+    def applies_to(self, method: str) -> bool:
+        return not self.methods or method in self.methods
+
+
+@dataclass(slots=True)
+class _Node:
+    children: dict[str, _Node] = field(default_factory=dict)
+    param: _Node | None = None
+    policies: list[RateLimitPolicy] = field(default_factory=list)
+
+
+def _segments(path: str) -> list[str]:
+    return [segment for segment in path.split("/") if segment]
+
+
+def _is_param(segment: str) -> bool:
+    return segment.startswith("{") and segment.endswith("}")
+
+
+class PolicyMatcher:
+    """Path-template matcher compiled once from a policy table.
+
+    Templates without parameters are looked up in a dict; the rest live in a
+    segment trie, so a lookup costs one dict probe per path segment no matter
+    how many policies are registered. Static segments win over parameters,
+    and earlier policies win over later ones for the same template.
+    """
+
+    def __init__(self, policies: list[RateLimitPolicy]) -> None:
+        self._static: dict[str, list[RateLimitPolicy]] = {}
+        self._root = _Node()
+        for policy in policies:
+            segments = _segments(policy.path)
+            if not any(_is_param(segment) for segment in segments):
+                self._static.setdefault(self._normalize(policy.path), []).append(policy)
+                continue
+            node = self._root
+            for segment in segments:
+                if _is_param(segment):
+                    node.param = node.param or _Node()
+                    node = node.param
+                else:
+                    node = node.children.setdefault(segment, _Node())
+            node.policies.append(policy)
+
+    @staticmethod
+    def _normalize(path: str) -> str:
+        return "/" + "/".join(_segments(path))
+
+    @staticmethod
+    def _pick(policies: list[RateLimitPolicy], method: str) -> RateLimitPolicy | None:
+        for policy in policies:
+            if policy.applies_to(method):
+                return policy
+        return None
+
+    def _walk(
+        self, node: _Node, segments: list[str], index: int, method: str
+    ) -> RateLimitPolicy | None:
+        if index == len(segments):
+            return self._pick(node.policies, method)
+        child = node.children.get(segments[index])
+        if child is not None:
+            policy = self._walk(child, segments, index + 1, method)
+            if policy is not None:
+                return policy
+        if node.param is not None:
+            return self._walk(node.param, segments, index + 1, method)
+        return None
+
+    def match(self, method: str, path: str) -> RateLimitPolicy | None:
+        """Return the policy for the request, or None for the default budget."""
+        method = method.upper()
+        static = self._static.get(self._normalize(path))
+        if static:
+            policy = self._pick(static, method)
+            if policy is not None:
+                return policy
+        return self._walk(self._root, _segments(path), 0, method)
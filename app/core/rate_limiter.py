@@ -1,45 +1,457 @@
-"""Sliding window rate limiter implementation."""
+"""Redis-backed rate limiter with pluggable algorithms."""
 
-from collections import deque
+import asyncio
+import logging
+import math
 import time
-from threading import Lock
+import uuid
+from dataclasses import dataclass
 from typing import Optional
 
-from app.cache import get_redis
-from redis.asyncio import Redis
+from app.cache import redis_clients
+from app.cache.keys import make_key
+from app.core.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger("app.rate_limiter")
+
+# All algorithm scripts share one calling convention so they are
+# interchangeable. ARGV is (now, window, limit, member, pending, cost):
+# ``pending`` requests were already served by a worker's local allowance and
+# are recorded unconditionally; ``cost`` is 1 to decide and record the current
+# request and 0 to only report pending hits (a peek when pending is 0). Each
+# returns {allowed, remaining, retry_after, reset_after}: ``reset_after`` is the
+# time until the window or bucket frees capacity for one more request (0 when
+# nothing is used). Both times are strings because Lua numbers are truncated
+# to integers on their way back to the client.
+
+# Sliding window log: one ZSET member per request, exact but O(limit) memory.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local member = ARGV[4]
+local pending = tonumber(ARGV[5])
+local cost = tonumber(ARGV[6])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+for i = 1, pending do
+    redis.call('ZADD', key, now, member .. ':' .. i)
+end
+local count = redis.call('ZCARD', key)
+local allowed = 1
+if cost > 0 then
+    if count < limit then
+        redis.call('ZADD', key, now, member)
+        count = count + 1
+    else
+        allowed = 0
+    end
+end
+if count > 0 then
+    redis.call('PEXPIRE', key, math.ceil(window * 1000))
+end
+
+local reset_after = 0
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset_after = tonumber(oldest[2]) + window - now
+end
+local retry_after = 0
+if allowed == 0 or (cost == 0 and count >= limit) then
+    retry_after = oldest[2] and reset_after or window
+end
+return {allowed, math.max(limit - count, 0), tostring(retry_after), tostring(reset_after)}
+"""
+
+# Sliding window counter: two fixed-window counts in a hash, with the previous
+# window weighted by how much of it still overlaps the sliding window.
+SLIDING_WINDOW_COUNTER_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local pending = tonumber(ARGV[5])
+local cost = tonumber(ARGV[6])
+
+local current_start = math.floor(now / window) * window
+local data = redis.call('HMGET', key, 'start', 'cur', 'prev')
+local start = tonumber(data[1]) or current_start
+local cur = tonumber(data[2]) or 0
+local prev = tonumber(data[3]) or 0
+if current_start > start then
+    if current_start - start == window then
+        prev = cur
+    else
+        prev = 0
+    end
+    cur = 0
+    start = current_start
+end
+
+cur = cur + pending
+local weight = (window - (now - start)) / window
+local estimated = prev * weight + cur
+local allowed = 1
+if cost > 0 then
+    if estimated + cost <= limit then
+        cur = cur + cost
+        estimated = estimated + cost
+    else
+        allowed = 0
+    end
+end
+redis.call('HSET', key, 'start', start, 'cur', cur, 'prev', prev)
+redis.call('PEXPIRE', key, math.ceil(window * 2000))
+
+-- Capacity frees once the estimate drops to ``target``: as the previous window
+-- slides out if that suffices, otherwise when the current window ends.
+local remaining = math.max(math.floor(limit - estimated), 0)
+local reset_after = 0
+if estimated > 0 then
+    local target = limit - remaining - 1
+    if cur <= target and prev > 0 then
+        reset_after = start + window * (1 - (target - cur) / prev) - now
+    else
+        reset_after = start + window - now
+    end
+end
+local retry_after = 0
+if allowed == 0 or (cost == 0 and estimated + 1 > limit) then
+    retry_after = reset_after
+end
+return {allowed, remaining, tostring(retry_after), tostring(reset_after)}
+"""
+
+# Generic cell rate algorithm: a single theoretical arrival time per client.
+# Requests are spaced window / limit apart with a burst of up to ``limit``.
+GCRA_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local pending = tonumber(ARGV[5])
+local cost = tonumber(ARGV[6])
+
+local interval = window / limit
+local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+tat = tat + pending * interval
+local allowed = 1
+if cost > 0 then
+    if tat + cost * interval - window <= now then
+        tat = tat + cost * interval
+    else
+        allowed = 0
+    end
+end
+if tat > now then
+    local ttl = math.max(math.ceil((tat - now) * 1000), 1)
+    redis.call('SET', key, string.format('%.6f', tat), 'PX', ttl)
+end
+
+local remaining = math.max(math.floor((window - (tat - now)) / interval), 0)
+local reset_after = 0
+if tat > now then
+    reset_after = tat + (remaining + 1) * interval - window - now
+end
+local retry_after = 0
+if allowed == 0 or (cost == 0 and remaining == 0) then
+    retry_after = tat + interval - window - now
+end
+return {allowed, remaining, tostring(retry_after), tostring(reset_after)}
+"""
+
+# Token bucket: ``limit`` tokens refilled continuously over ``window``.
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local pending = tonumber(ARGV[5])
+local cost = tonumber(ARGV[6])
+
+local rate = limit / window
+local data = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(data[1]) or limit
+local ts = tonumber(data[2]) or now
+tokens = math.min(limit, tokens + math.max(now - ts, 0) * rate) - pending
+local allowed = 1
+if cost > 0 then
+    if tokens >= cost then
+        tokens = tokens - cost
+    else
+        allowed = 0
+    end
+end
+redis.call('HSET', key, 'tokens', string.format('%.6f', tokens), 'ts', string.format('%.6f', now))
+redis.call('PEXPIRE', key, math.ceil(window * 1000))
+
+local remaining = math.max(math.floor(tokens), 0)
+local reset_after = 0
+if tokens < limit then
+    reset_after = (math.min(remaining + 1, limit) - tokens) / rate
+end
+local retry_after = 0
+if allowed == 0 then
+    retry_after = (cost - tokens) / rate
+elseif cost == 0 and tokens < 1 then
+    retry_after = (1 - tokens) / rate
+end
+return {allowed, remaining, tostring(retry_after), tostring(reset_after)}
+"""
+
+ALGORITHM_SCRIPTS = {
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "sliding_window_counter": SLIDING_WINDOW_COUNTER_SCRIPT,
+    "gcra": GCRA_SCRIPT,
+    "token_bucket": TOKEN_BUCKET_SCRIPT,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    """Outcome of a single rate limit check.
+
+    ``retry_after`` is the wait before a denied request may be retried (0 when
+    allowed); ``reset_after`` the time until the window frees capacity.
+    """
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    reset_after: float = 0.0
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """`X-RateLimit-*` headers describing this result."""
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(max(self.reset_after, self.retry_after))),
+        }
+
+
+@dataclass(slots=True)
+class _LocalQuota:
+    """Per-client allowance handed out to this worker by the last Redis sync."""
+    allowance: int = 0
+    pending: int = 0
+    synced_at: float = 0.0
+    blocked_until: float = 0.0
+    reset_at: float = 0.0
 
 
 class RateLimiter:
-    """Sliding window rate limiter using Redis for storage.
+    """Rate limiter using Redis for storage.
 
-    Maintains a rolling window of request timestamps per client.
+    ``algorithm`` selects the server-side script: ``sliding_window`` (default)
+    keeps a rolling log of request timestamps per client, while
+    ``sliding_window_counter``, ``gcra`` and ``token_bucket`` use constant
+    memory per client. The check-and-record step runs as a registered Lua
+    script (EVALSHA), so each request costs a single atomic round trip.
+
+    With ``local_budget`` set, the limiter runs in hybrid mode: after each
+    Redis sync the worker may serve up to ``local_budget`` further requests
+    per client from memory, reporting them in a batch on the next sync. A
+    sync happens when the local allowance runs out, when it is older than
+    ``sync_interval`` seconds, or on `flush()`. Each worker can overshoot the
+    global limit by at most ``local_budget`` requests per client.
+
+    With a ``breaker``, Redis failures no longer propagate: while the circuit
+    is open (or when a check fails) each worker enforces ``max_requests`` per
+    client in a local fixed window, so the effective limit is multiplied by
+    the number of workers until Redis is back.
     """
 
-    def __init__(self, max_requests: int, window_seconds: int, client_provider=get_redis):
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        client_provider=redis_clients.provider("limiter"),
+        local_budget: int = 0,
+        sync_interval: float = 1.0,
+        algorithm: str = "sliding_window",
+        breaker: CircuitBreaker | None = None,
+    ):
+        if algorithm not in ALGORITHM_SCRIPTS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self.algorithm = algorithm
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self._get_client = client_provider
+        self.local_budget = local_budget
+        self.sync_interval = sync_interval
+        self._local: dict[str, _LocalQuota] = {}
+        self._script = None
+        self.breaker = breaker
+        self._fallback_counts: dict[str, int] = {}
+        self._fallback_reset_at = 0.0
+        # Limiters created by with_limits; flush() (and so run_sync()) covers them too
+        self._derived: list[RateLimiter] = []
+
+    def with_limits(self, max_requests: int, window_seconds: int) -> "RateLimiter":
+        """Return a limiter with other limits but the same backend settings.
 
-    async def _clean_old_requests(self, redis: Redis, key: str, now: float) -> None:
-        """Remove timestamps outside the current window."""
-        cutoff = now - self.window_seconds
-        await redis.zremrangebyscore(key, '-inf', cutoff)
+        The new limiter is flushed together with this one, so only the root
+        limiter needs ``run_sync()`` and a final ``flush()``.
+        """
+        limiter = RateLimiter(
+            max_requests,
+            window_seconds,
+            client_provider=self._get_client,
+            local_budget=self.local_budget,
+            sync_interval=self.sync_interval,
+            algorithm=self.algorithm,
+            breaker=self.breaker,
+        )
+        self._derived.append(limiter)
+        return limiter
+
+    def _key(self, client_id: str) -> str:
+        # Hash-tagged by client so a client's buckets share one cluster slot.
+        if self.algorithm == "sliding_window":
+            return make_key("rate_limit", tag=client_id)
+        return make_key("rate_limit", self.algorithm, tag=client_id)
+
+    async def _eval(self, client, client_id: str, pending: int = 0, cost: int = 1):
+        now = time.time()
+        # Members must be unique, otherwise same-timestamp requests collapse.
+        member = f"{now:.6f}:{uuid.uuid4().hex[:8]}"
+        if self._script is None:
+            self._script = client.register_script(ALGORITHM_SCRIPTS[self.algorithm])
+        return await self._script(
+            keys=[self._key(client_id)],
+            args=[now, self.window_seconds, self.max_requests, member, pending, cost],
+            client=client,
+        )
+
+    async def _check_remote(self, client_id: str, pending: int = 0) -> RateLimitResult:
+        redis = await self._get_client()
+        allowed, remaining, retry_after, reset_after = await self._eval(redis, client_id, pending)
+        return RateLimitResult(
+            allowed=bool(int(allowed)),
+            limit=self.max_requests,
+            remaining=int(remaining),
+            retry_after=max(float(retry_after), 0.0),
+            reset_after=max(float(reset_after), 0.0),
+        )
+
+    async def _check_local(self, client_id: str) -> RateLimitResult:
+        now = time.monotonic()
+        quota = self._local.setdefault(client_id, _LocalQuota())
+        if now < quota.blocked_until:
+            wait = quota.blocked_until - now
+            return RateLimitResult(False, self.max_requests, 0, wait, wait)
+        if quota.allowance > 0 and now - quota.synced_at < self.sync_interval:
+            quota.allowance -= 1
+            quota.pending += 1
+            reset_after = max(quota.reset_at - now, 0.0)
+            return RateLimitResult(True, self.max_requests, quota.allowance, 0.0, reset_after)
+
+        pending, quota.pending = quota.pending, 0
+        try:
+            result = await self._check_remote(client_id, pending)
+        except Exception:
+            quota.pending += pending
+            raise
+        quota.synced_at = time.monotonic()
+        quota.reset_at = quota.synced_at + result.reset_after
+        if result.allowed:
+            quota.allowance = min(self.local_budget, result.remaining)
+        else:
+            quota.allowance = 0
+            quota.blocked_until = quota.synced_at + result.retry_after
+        return result
+
+    def _check_fallback(self, client_id: str) -> RateLimitResult:
+        """Per-worker fixed window used while Redis is unavailable."""
+        now = time.monotonic()
+        if now >= self._fallback_reset_at:
+            self._fallback_counts.clear()
+            self._fallback_reset_at = now + self.window_seconds
+        count = self._fallback_counts.get(client_id, 0)
+        reset_after = self._fallback_reset_at - now
+        if count >= self.max_requests:
+            return RateLimitResult(False, self.max_requests, 0, reset_after, reset_after)
+        self._fallback_counts[client_id] = count + 1
+        remaining = self.max_requests - count - 1
+        return RateLimitResult(True, self.max_requests, remaining, 0.0, reset_after)
+
+    async def _check(self, client_id: str) -> RateLimitResult:
+        if self.local_budget > 0:
+            return await self._check_local(client_id)
+        return await self._check_remote(client_id)
+
+    async def check(self, client_id: str) -> RateLimitResult:
+        """Decide and record a request for the client in one round trip."""
+        if self.breaker is None:
+            return await self._check(client_id)
+        if not self.breaker.allow():
+            return self._check_fallback(client_id)
+        try:
+            async with self.breaker.observe():
+                return await self._check(client_id)
+        except self.breaker.expected as e:
+            logger.warning(f"Rate limit check failed, limiting locally: {e}")
+            return self._check_fallback(client_id)
+
+    async def flush(self) -> None:
+        """Report locally served requests of this and every derived limiter to Redis.
+
+        Each limiter is flushed even if another one fails; the first error is
+        raised afterwards.
+        """
+        error: Exception | None = None
+        for flush in (self._flush_local, *(limiter.flush for limiter in self._derived)):
+            try:
+                await flush()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    async def _flush_local(self) -> None:
+        """Report this limiter's locally served requests in one pipelined batch.
+
+        Also drops idle local entries so the table stays bounded.
+        """
+        now = time.monotonic()
+        batch: dict[str, int] = {}
+        for client_id, quota in list(self._local.items()):
+            if quota.pending:
+                batch[client_id], quota.pending = quota.pending, 0
+            elif now - quota.synced_at >= self.sync_interval and now >= quota.blocked_until:
+                del self._local[client_id]
+        if not batch:
+            return
+
+        redis = await self._get_client()
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for client_id, pending in batch.items():
+                    await self._eval(pipe, client_id, pending, cost=0)
+                await pipe.execute()
+        except Exception:
+            for client_id, pending in batch.items():
+                self._local.setdefault(client_id, _LocalQuota()).pending += pending
+            raise
+
+    async def run_sync(self) -> None:
+        """Periodically flush local counts; run as a background task."""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Rate limit sync failed: {e}")
 
     async def is_allowed(self, client_id: str) -> bool:
         """Check if the client is allowed to make a request.
 
         Cleans expired timestamps and adds current timestamp if allowed.
         """
-        redis = await self._get_client()
-        key = f"rate_limit:{client_id}"
-        now = time.time()
-        await self._clean_old_requests(redis, key, now)
-        count = await redis.zcard(key)
-        if count < self.max_requests:
-            await redis.zadd(key, {str(now): 1})
-            await redis.expire(key, int(self.window_seconds * 2))
-            return True
-        return False
+        result = await self.check(client_id)
+        return result.allowed
 
     async def get_retry_after(self, client_id: str) -> Optional[float]:
         """Get seconds until the client can make another request.
@@ -47,23 +459,17 @@ class RateLimiter:
         Returns None if allowed, otherwise seconds to wait.
         """
         redis = await self._get_client()
-        key = f"rate_limit:{client_id}"
-        now = time.time()
-        await self._clean_old_requests(redis, key, now)
-        count = await redis.zcard(key)
-        if count < self.max_requests:
+        _, remaining, retry_after, _ = await self._eval(redis, client_id, cost=0)
+        if int(remaining) > 0:
             return None
-        # Get the oldest timestamp
-        oldest = await redis.zrange(key, 0, 0, withscores=True)
-        if oldest:
-            oldest_time = oldest[0][1]
-            return (oldest_time + self.window_seconds) - now
-        return None
+        return max(float(retry_after), 0.0)
 
     async def get_request_count(self, client_id: str) -> int:
-        """Get current request count in window for client."""
+        """Get current request count in window for client.
+
+        Exact for ``sliding_window``; an estimate derived from the remaining
+        budget for the constant-memory algorithms.
+        """
         redis = await self._get_client()
-        key = f"rate_limit:{client_id}"
-        now = time.time()
-        await self._clean_old_requests(redis, key, now)
-        return await redis.zcard(key)
+        _, remaining, _, _ = await self._eval(redis, client_id, cost=0)
+        return self.max_requests - int(remaining)
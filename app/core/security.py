@@ -1,41 +1,100 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
+from typing import Any
+
 from fastapi import Depends
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import jwt
 
+from app.cache import principal_cache, token_revocations
 from app.core.config import settings
-from app.core.errors import UnauthorizedError
+from app.core.errors import ForbiddenError, UnauthorizedError
 from app.db.session import get_db_session
-from app.repositories.user_repository import UserRepository
+from app.repositories.user_repository import CachedUser, UserRepository
+from app.schemas.auth_schema import Role
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
-    session: AsyncSession = Depends(get_db_session),
-):
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Caller identity taken from stateless token claims (no user lookup)."""
+    id: str
+    role: Role
+    is_active: bool
+
+
+def _bearer_token(credentials: HTTPAuthorizationCredentials | None) -> str:
     if not credentials or credentials.scheme.lower() != "bearer":
         raise UnauthorizedError(message="Missing bearer token")
+    return credentials.credentials
 
-    token = credentials.credentials
+
+def _decode_token(token: str) -> dict[str, Any]:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
     except jwt.PyJWTError as exc:
         raise UnauthorizedError(message="Invalid token", details=str(exc)) from exc
 
-    subject = payload.get("sub")
-    if not subject:
+    if not payload.get("sub"):
         raise UnauthorizedError(message="Invalid token subject")
+    return payload
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_db_session),
+):
+    token = _bearer_token(credentials)
+    # Seen this token within the last seconds: skip signature check and lookup
+    if principal_cache is not None:
+        principal = principal_cache.get(token)
+        if principal is not None:
+            return principal.to_user()
 
-    user_id = str(subject)
+    payload = _decode_token(token)
+    user_id = str(payload["sub"])
 
     repository = UserRepository(session)
     user = await repository.get_by_id(user_id)
     if not user or not user.is_active:
         raise UnauthorizedError(message="Invalid credentials")
 
+    if principal_cache is not None:
+        principal = CachedUser.from_orm(user)
+        principal_cache.set(token, user.id, principal, expires_at=payload.get("exp"))
+
     return user
+
+
+async def get_current_admin(current_user=Depends(get_current_user)):
+    if current_user.role != Role.admin:
+        raise ForbiddenError(message="Admin role required")
+    return current_user
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Authorize from token claims alone when the token carries them.
+
+    Tokens without a version claim (or with stateless tokens disabled) go
+    through `get_current_user` instead, as does every token while the
+    revocation state is stale.
+    """
+    token = _bearer_token(credentials)
+    if token_revocations is None:
+        return await get_current_user(credentials, session)
+
+    payload = _decode_token(token)
+    if "ver" not in payload or token_revocations.is_stale():
+        return await get_current_user(credentials, session)
+
+    user_id = str(payload["sub"])
+    if not payload.get("active") or not await token_revocations.is_current(user_id, payload["ver"]):
+        raise UnauthorizedError(message="Invalid credentials")
+    return Principal(id=user_id, role=Role(payload["role"]), is_active=True)
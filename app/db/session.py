@@ -1,7 +1,14 @@
 from collections.abc import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, get_breaker
 from app.core.config import settings
 from app.db.base import Base
 import app.models  # noqa: F401
@@ -15,10 +22,43 @@ engine = create_async_engine(
 
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+# Connectivity failures only; constraint violations and the like prove Postgres answered
+db_breaker = get_breaker(
+    "postgres",
+    expected=(exc.OperationalError, exc.InterfaceError, exc.TimeoutError, OSError, TimeoutError),
+)
+
+
+def track_breaker(async_engine: AsyncEngine, breaker: CircuitBreaker) -> None:
+    """Record the outcome of every statement, commit and connect on ``breaker``.
+
+    Only errors raised by the database driver reach the breaker; whatever the
+    request does around its queries cannot trip it.
+    """
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def _record_success(conn, cursor, statement, parameters, context, executemany) -> None:
+        breaker.record_success()
+
+    @event.listens_for(async_engine.sync_engine, "handle_error")
+    def _record_error(context) -> None:
+        breaker.record(context.sqlalchemy_exception or context.original_exception)
+
+
+track_breaker(engine, db_breaker)
+
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
-    async with AsyncSessionLocal() as session:
-        yield session
+    # Requests fail fast with 503 while the circuit is open
+    probing = db_breaker.state is CircuitState.half_open
+    if not db_breaker.allow():
+        raise CircuitOpenError(db_breaker.name, db_breaker.retry_after)
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        if probing:
+            db_breaker.release()   # no-op once a statement has recorded the probe's outcome
 
 
 async def init_db() -> None:
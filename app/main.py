@@ -1,26 +1,100 @@
+import asyncio
+
 from fastapi import FastAPI
-from prometheus_fastapi_instrumentator import Instrumentator
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_fastapi_instrumentator import Instrumentator
 
-from app.api.v1.routers import auth_router as auth, health_router as health, user_router as users
+from app.api.v1.routers import admin_router as admin
+from app.api.v1.routers import auth_router as auth
+from app.api.v1.routers import health_router as health
+from app.api.v1.routers import user_router as users
+from app.cache import (
+    cache,
+    email_filter,
+    idempotency_store,
+    principal_cache,
+    redis_breaker,
+    redis_clients,
+    token_revocations,
+    user_hot_keys,
+)
 from app.core.config import settings
 from app.core.errors import register_error_handlers
-from app.core.logging import configure_logging
-from app.db.session import init_db
-from app.middleware.request_id import RequestIdMiddleware
-
+from app.core.logging import configure_logging, logger
+from app.core.passwords import password_hasher
+from app.core.rate_limit_policy import RateLimitPolicy
 from app.core.rate_limiter import RateLimiter
+from app.db.session import AsyncSessionLocal, init_db
+from app.middleware.idempotency import IdempotencyMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.request_id import RequestIdMiddleware
+from app.repositories.user_repository import UserRepository
+
+
+async def populate_email_filter() -> None:
+    """Build the email Bloom filter once per deployment (any worker may do it)."""
+    try:
+        if await email_filter.is_ready():
+            return
+        async with AsyncSessionLocal() as session:
+            count = await UserRepository(session).rebuild_email_filter()
+        logger.info(f"Email Bloom filter populated with {count} entries")
+    except Exception as e:
+        logger.warning(f"Email Bloom filter rebuild failed, lookups fall through: {e}")
+
+
+async def warm_hot_users() -> None:
+    """Share this worker's hot users and keep the shared hot set cached.
+
+    Runs at startup (warming a cold cache after a deploy or failover) and then
+    every ``USER_HOT_KEYS_WARM_INTERVAL_SECONDS``, before cached users expire.
+    One worker per interval does the warming.
+    """
+    interval = settings.user_hot_keys_warm_interval_seconds
+    while True:
+        try:
+            await user_hot_keys.flush()
+            user_hot_keys.decay()
+            if await user_hot_keys.claim(interval * 0.9):
+                user_ids = [user_id for user_id, _ in await user_hot_keys.load()]
+                if user_ids:
+                    async with AsyncSessionLocal() as session:
+                        count = await UserRepository(session).warm(user_ids)
+                    logger.info(f"Warmed {count} hot users")
+        except Exception as e:
+            logger.warning(f"Hot user warming failed: {e}")
+        await asyncio.sleep(interval)
 
 
 def create_app() -> FastAPI:
     configure_logging(settings)
 
     app = FastAPI(title=settings.app_name)
+    # Innermost: stored responses exclude the request id and rate limit headers
+    app.add_middleware(
+        IdempotencyMiddleware,
+        store=idempotency_store,
+        methods=settings.idempotency_methods,
+        ttl=settings.idempotency_ttl_seconds,
+        lock_ttl=settings.idempotency_lock_ttl_seconds,
+        wait_timeout=settings.idempotency_wait_timeout_seconds,
+    )
     app.add_middleware(RequestIdMiddleware)
 
-    rate_limiter = RateLimiter(settings.rate_limit_max, settings.rate_limit_window_seconds)
-    app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter, exempt_routes=settings.rate_limit_exempt_routes)
+    rate_limiter = RateLimiter(
+        settings.rate_limit_max,
+        settings.rate_limit_window_seconds,
+        local_budget=settings.rate_limit_local_budget,
+        sync_interval=settings.rate_limit_sync_interval_seconds,
+        algorithm=settings.rate_limit_algorithm,
+        breaker=redis_breaker,
+    )
+    app.add_middleware(
+        RateLimitMiddleware,
+        rate_limiter=rate_limiter,
+        exempt_routes=settings.rate_limit_exempt_routes,
+        policies=[RateLimitPolicy(**policy) for policy in settings.rate_limit_policies],
+    )
 
     # CORS
     app.add_middleware(
@@ -34,17 +108,45 @@ def create_app() -> FastAPI:
     app.include_router(health.router, prefix=settings.api_prefix, tags=["health"])
     app.include_router(auth.router, prefix=settings.api_prefix)
     app.include_router(users.router, prefix=settings.api_prefix)
+    app.include_router(admin.router, prefix=settings.api_prefix)
 
     register_error_handlers(app)
 
     Instrumentator().instrument(app).expose(app, endpoint=settings.metrics_path)
 
+    background_tasks: list[asyncio.Task] = []
+
     @app.on_event("startup")
     async def on_startup() -> None:
         
         if settings.create_tables_on_startup:
             await init_db()
 
+        if rate_limiter.local_budget > 0:
+            background_tasks.append(asyncio.create_task(rate_limiter.run_sync()))
+        if cache.local is not None:
+            background_tasks.append(asyncio.create_task(cache.listen_for_invalidations()))
+        if email_filter is not None:
+            background_tasks.append(asyncio.create_task(populate_email_filter()))
+        if user_hot_keys is not None:
+            background_tasks.append(asyncio.create_task(warm_hot_users()))
+        if token_revocations is not None:
+            background_tasks.append(asyncio.create_task(token_revocations.run_sync()))
+        if principal_cache is not None:
+            background_tasks.append(asyncio.create_task(principal_cache.listen_for_evictions()))
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        for task in background_tasks:
+            task.cancel()
+        if rate_limiter.local_budget > 0:
+            try:
+                await rate_limiter.flush()
+            except Exception as e:
+                logger.warning(f"Final rate limit sync failed: {e}")
+        await redis_clients.close()
+        password_hasher.shutdown()
+
     return app
 
 
@@ -21,7 +21,7 @@ class AuthMediator:
 
     async def login(self, payload: AuthLogin) -> LoginResponse:
         user = await self.service.authenticate(email=payload.email, password=payload.password)
-        access_token = self.service.create_access_token(subject=str(user.id))
+        access_token = await self.service.issue_access_token(user)
         return LoginResponse(
             access_token=access_token,
             token_type="bearer",
@@ -1,24 +1,86 @@
 from __future__ import annotations
+
+import csv
+import io
+from collections.abc import AsyncIterator
 from typing import Any
 
-from app.schemas.user_schema import UserRead
+from app.cache import ModelCodec, cached
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.auth_schema import Role
+from app.schemas.user_schema import ExportFormat, UserPage, UserRead
 from app.services.user_service import UserService
 
+EXPORT_FIELDS = list(UserRead.model_fields)
+
 
 class UserMediator:
     def __init__(self, service: UserService) -> None:
         self.service = service
 
+    @cached(
+        ttl=settings.cache_result_ttl_seconds,
+        tags=("user:{user_id}",),
+        codec=ModelCodec(UserRead),
+    )
     async def get_user(self, user_id: str) -> UserRead:
         user = await self.service.get_user(user_id)
         return UserRead.model_validate(user)
 
-    async def list_users(self) -> list[UserRead]:
-        users = await self.service.list_users()
-        return [UserRead.model_validate(user) for user in users]
+    @cached(ttl=settings.cache_result_ttl_seconds, tags=("users",), codec=ModelCodec(UserPage))
+    async def list_users(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        role: Role | None = None,
+        is_active: bool | None = None,
+    ) -> UserPage:
+        users, next_cursor = await self.service.list_users(
+            limit,
+            cursor,
+            role=User.Role(role.value) if role is not None else None,
+            is_active=is_active,
+        )
+        return UserPage(
+            items=[UserRead.model_validate(user) for user in users], next_cursor=next_cursor
+        )
 
     async def update_user(self, user_id: str, updates: dict[str, Any]) -> User:
         return await self.service.update_user(user_id, updates)
 
     async def delete_user(self, user_id: str) -> bool:
         return await self.service.delete_user(user_id)
+
+    async def export_users(
+        self,
+        export_format: ExportFormat,
+        chunk_size: int,
+        role: Role | None = None,
+        is_active: bool | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Serialize matching users one chunk at a time; nothing is read ahead of the consumer."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format is ExportFormat.csv:
+            writer.writerow(EXPORT_FIELDS)
+
+        chunks = self.service.stream_users(
+            chunk_size,
+            role=User.Role(role.value) if role is not None else None,
+            is_active=is_active,
+        )
+        async for chunk in chunks:
+            rows = [UserRead.model_validate(user) for user in chunk]
+            if export_format is ExportFormat.ndjson:
+                yield b"".join(row.model_dump_json().encode() + b"\n" for row in rows)
+                continue
+            for row in rows:
+                writer.writerow(row.model_dump(mode="json").values())
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+        # CSV of an empty selection still carries its header
+        if buffer.tell():
+            yield buffer.getvalue().encode()
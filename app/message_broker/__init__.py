@@ -2,7 +2,8 @@
 
 Provides:
     - init_rabbit(): lazy connection/channel initialiser.
-    - publish(exchange, routing_key, message): publish persistent JSON message.
+    - publish(exchange, routing_key, message): publish persistent JSON message
+      (through the ``rabbitmq`` circuit breaker).
     - consume(queue_name, handler): attach async consumer that processes JSON messages.
 """
 from __future__ import annotations
@@ -10,12 +11,15 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from datetime import datetime, timezone
-from typing import Any, Awaitable, Callable, Optional
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import Any, Optional
 
 import aio_pika
 from aio_pika import Channel, DeliveryMode, Exchange, Message, RobustConnection
+from aio_pika.exceptions import AMQPError
 
+from app.core.circuit_breaker import get_breaker
 from app.core.config import settings
 
 logger = logging.getLogger("app.queue")
@@ -23,6 +27,7 @@ logger = logging.getLogger("app.queue")
 _connection: Optional[RobustConnection] = None
 _channel: Optional[Channel] = None
 _lock = asyncio.Lock()
+broker_breaker = get_breaker("rabbitmq", expected=(AMQPError, OSError, TimeoutError))
 
 
 async def _ensure_channel() -> Channel:  # noqa: C901
@@ -58,11 +63,15 @@ async def _ensure_channel() -> Channel:  # noqa: C901
 
 
 async def publish(exchange_name: str, routing_key: str, message: dict[str, Any]) -> None:
-    channel = await _ensure_channel()
-    exchange: Exchange = await channel.get_exchange(exchange_name)
-    payload = json.dumps({"timestamp": datetime.now(timezone.utc).isoformat(), **message}).encode()
-    msg = Message(payload, delivery_mode=DeliveryMode.PERSISTENT, content_type="application/json")
-    await exchange.publish(msg, routing_key=routing_key)
+    """Publish a message; raises `CircuitOpenError` at once while RabbitMQ is down."""
+    async with broker_breaker.guard():
+        channel = await _ensure_channel()
+        exchange: Exchange = await channel.get_exchange(exchange_name)
+        payload = json.dumps({"timestamp": datetime.now(UTC).isoformat(), **message}).encode()
+        msg = Message(
+            payload, delivery_mode=DeliveryMode.PERSISTENT, content_type="application/json"
+        )
+        await exchange.publish(msg, routing_key=routing_key)
     logger.debug("Published %s to %s:%s", message, exchange_name, routing_key)
 
 
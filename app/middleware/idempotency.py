@@ -0,0 +1,200 @@
+"""Idempotency-Key middleware for write endpoints."""
+
+import hashlib
+import logging
+import time
+
+from prometheus_client import Counter
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.cache.idempotency import IdempotencyStore, StoredResponse
+from app.core.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "app_idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome.",
+    ["result"],
+)
+
+MAX_KEY_LENGTH = 255
+
+
+def _error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code, content={"code": code, "message": message, "details": None}
+    )
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware that runs each ``Idempotency-Key`` at most once.
+
+    The first response for a key (per method, path and Authorization header)
+    is stored for ``ttl`` seconds and replayed, with ``Idempotent-Replayed:
+    true``, to every retry carrying the same query string and body; any other
+    request with the key gets a 422. Retries that arrive while the first
+    request is still running wait for its response for up to ``wait_timeout``
+    seconds. 5xx responses are not stored, so the request can be retried. If
+    the store is unavailable (including while its circuit breaker is open),
+    requests run normally rather than failing with a 503.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: IdempotencyStore,
+        methods: list[str] | None = None,
+        ttl: float = 86_400.0,
+        lock_ttl: float = 30.0,
+        wait_timeout: float = 10.0,
+        header_name: str = "Idempotency-Key",
+    ) -> None:
+        self.app = app
+        self.store = store
+        methods = methods or ["POST", "PUT", "PATCH", "DELETE"]
+        self.methods = {method.upper() for method in methods}
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.header_name = header_name
+
+    @staticmethod
+    def _scoped_key(scope: Scope, headers: Headers, key: str) -> str:
+        # Scoped to the caller, so one client can never replay another's response
+        authorization = headers.get("authorization", "")
+        identity = "\n".join((scope["method"], scope["path"], authorization, key))
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    @staticmethod
+    def _fingerprint(scope: Scope, body: bytes) -> str:
+        digest = hashlib.sha256(scope.get("query_string", b""))
+        digest.update(b"\n")
+        digest.update(body)
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay(stored: StoredResponse) -> Response:
+        response = Response(content=stored.body, status_code=stored.status)
+        response.raw_headers = [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.headers
+        ] + [(b"idempotent-replayed", b"true")]
+        return response
+
+    async def _claim(self, key: str, fingerprint: str) -> Response | None:
+        """Take the key, or return the response to send instead of running the request."""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            stored = await self.store.get(key)
+            if stored is None and await self.store.acquire(key, self.lock_ttl):
+                return None
+            if stored is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    IDEMPOTENCY_REQUESTS.labels(result="in_progress").inc()
+                    return _error(
+                        409, "idempotency_in_progress", "A request with this key is still running"
+                    )
+                stored = await self.store.wait(key, remaining)
+                if stored is None:
+                    continue   # released without a response (or timed out): retry the claim
+            if stored.fingerprint != fingerprint:
+                IDEMPOTENCY_REQUESTS.labels(result="mismatch").inc()
+                return _error(
+                    422,
+                    "idempotency_key_reused",
+                    "Idempotency key was used with a different request",
+                )
+            IDEMPOTENCY_REQUESTS.labels(result="replayed").inc()
+            return self._replay(stored)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(self.header_name)
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            await _error(400, "invalid_idempotency_key", "Idempotency key is too long")(
+                scope, receive, send
+            )
+            return
+
+        body = await self._read_body(receive)
+        key = self._scoped_key(scope, headers, idempotency_key)
+        fingerprint = self._fingerprint(scope, body)
+
+        try:
+            response = await self._claim(key, fingerprint)
+        except Exception as e:
+            # An open circuit is already reported by the breaker's metrics
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Idempotency store unavailable, running request without it: {e}")
+            IDEMPOTENCY_REQUESTS.labels(result="bypassed").inc()
+            key = None
+            response = None
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        if key is None:
+            await self.app(scope, receive_body, send)
+            return
+
+        status = 500
+        complete = False
+        response_headers: list[tuple[str, str]] = []
+        chunks: list[bytes] = []
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal status, complete, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = [
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_and_capture)
+        finally:
+            try:
+                if complete and status < 500:
+                    stored = StoredResponse(fingerprint, status, response_headers, b"".join(chunks))
+                    await self.store.save(key, stored, self.ttl)
+                    IDEMPOTENCY_REQUESTS.labels(result="stored").inc()
+                else:
+                    await self.store.release(key)
+            except Exception as e:
+                logger.warning(f"Storing idempotent response failed: {e}")
@@ -1,46 +1,108 @@
 """Rate limiting middleware for FastAPI."""
 
 import logging
+import math
 
-from starlette.middleware.base import BaseHTTPMiddleware
-
+import jwt
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.responses import JSONResponse
 from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.config import settings
+from app.core.rate_limit_policy import PolicyMatcher, RateLimitPolicy
 from app.core.rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware to enforce sliding window rate limiting."""
+class RateLimitMiddleware:
+    """Pure ASGI middleware to enforce rate limiting.
+
+    Requests matching one of ``policies`` are counted against that policy's
+    own budget and bucket key; everything else shares ``rate_limiter`` keyed
+    by client IP. Policies and exempt routes are compiled into a
+    `PolicyMatcher` once, at construction.
+    """
 
-    def __init__(self, app, rate_limiter: RateLimiter, exempt_routes: list[str]):
-        super().__init__(app)
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate_limiter: RateLimiter,
+        exempt_routes: list[str],
+        policies: list[RateLimitPolicy] | None = None,
+    ):
+        self.app = app
         self.rate_limiter = rate_limiter
         self.exempt_routes = exempt_routes
+        policies = list(policies or [])
+        exempt = [
+            RateLimitPolicy(name=f"exempt:{path}", path=path, exempt=True) for path in exempt_routes
+        ]
+        self.matcher = PolicyMatcher(exempt + policies)
+        self.limiters = {
+            policy.name: rate_limiter.with_limits(policy.max_requests, policy.window_seconds)
+            for policy in policies
+            if not policy.exempt
+        }
+
+    @staticmethod
+    def _subject(headers: Headers) -> str | None:
+        """Verified JWT subject of the request, if it carries a valid bearer token."""
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        try:
+            payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+        except jwt.PyJWTError:
+            return None
+        subject = payload.get("sub")
+        return str(subject) if subject else None
 
-    async def dispatch(self, request, call_next):
-        if request.url.path in self.exempt_routes:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        client_ip = request.client.host if request.client else "unknown"
+        path = scope["path"]
+        policy = self.matcher.match(scope["method"], path)
+        if policy is not None and policy.exempt:
+            await self.app(scope, receive, send)
+            return
 
-        if not await self.rate_limiter.is_allowed(client_ip):
-            retry_after = await self.rate_limiter.get_retry_after(client_ip)
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+
+        if policy is None:
+            limiter, client_id = self.rate_limiter, client_ip
+        else:
+            limiter = self.limiters[policy.name]
+            subject = self._subject(Headers(scope=scope)) if policy.key == "user" else None
+            identity = f"user:{subject}" if subject else f"ip:{client_ip}"
+            client_id = f"{policy.name}:{identity}"
+
+        result = await limiter.check(client_id)
+        if not result.allowed:
             logger.warning(
                 "Rate limit exceeded",
                 extra={
                     "client_ip": client_ip,
-                    "path": request.url.path,
-                    "retry_after": retry_after,
+                    "path": path,
+                    "policy": policy.name if policy else None,
+                    "retry_after": result.retry_after,
                 },
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=HTTP_429_TOO_MANY_REQUESTS,
-                content={"error": "Rate limit exceeded", "retry_after": retry_after},
-                headers={"Retry-After": str(int(retry_after or 0))},
+                content={"error": "Rate limit exceeded", "retry_after": result.retry_after},
+                headers={"Retry-After": str(math.ceil(result.retry_after)), **result.headers},
             )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(result.headers)
+            await send(message)
 
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send_with_headers)
@@ -1,25 +1,37 @@
 import uuid
-from typing import Callable
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.logging import request_id_ctx_var
 
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
+class RequestIdMiddleware:
+    """Pure ASGI middleware that tags each request with an ID.
+
+    Reuses the incoming ``header_name`` value or generates a UUID, exposes it
+    through `request_id_ctx_var` for the duration of the request and echoes it
+    on the response.
+    """
+
     def __init__(self, app: ASGIApp, header_name: str = "X-Request-ID") -> None:
-        super().__init__(app)
+        self.app = app
         self.header_name = header_name
 
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Response]) -> Response:
-        request_id = request.headers.get(self.header_name) or str(uuid.uuid4())
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(self.header_name) or str(uuid.uuid4())
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header_name] = request_id
+            await send(message)
+
         token = request_id_ctx_var.set(request_id)
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_with_request_id)
         finally:
             request_id_ctx_var.reset(token)
-        response.headers[self.header_name] = request_id
-        return response
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from enum import Enum
 
-from sqlalchemy import Boolean, DateTime, Enum as SQLEnum, String
+from sqlalchemy import Boolean, DateTime, Enum as SQLEnum, Index, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -10,6 +10,12 @@ from app.db.mixins import UUIDMixin
 
 class User(UUIDMixin, Base):
     __tablename__ = "users"
+    # Keyset pagination of GET /users, optionally filtered by role and/or active state
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_role_is_active_created_at_id", "role", "is_active", "created_at", "id"),
+        Index("ix_users_is_active_created_at_id", "is_active", "created_at", "id"),
+    )
 
     full_name: Mapped[str] = mapped_column(String(100), nullable=False)
     email: Mapped[str] = mapped_column(String(255), nullable=False, unique=True, index=True)
@@ -1,25 +1,58 @@
 from __future__ import annotations
 
-from typing import Any, Self
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime
+from typing import Any, ClassVar, Self
 from dataclasses import asdict, dataclass
 from contextlib import suppress
 
-from sqlalchemy import select
+from sqlalchemy import inspect, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.cache import cache, CacheBackend  # assume you have proper typing
+from app.cache import (  # assume you have proper typing
+    cache,
+    CacheBackend,
+    email_filter,
+    principal_cache,
+    single_flight,
+    token_revocations,
+    user_hot_keys,
+)
+from app.cache.bloom import BloomFilter
+from app.cache.hotkeys import HotKeyTracker
+from app.cache.keys import make_key
+from app.cache.principals import PrincipalCache
+from app.cache.revocations import TokenRevocations
+from app.cache.singleflight import SingleFlight
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
+# Cached in place of a user that does not exist (negative caching).
+TOMBSTONE = {"__missing__": True}
+_MISSING = object()
+
 
 @dataclass(frozen=True, slots=True)
 class CachedUser:
-    """Flat, serializable version of user for cache"""
+    """Flat, serializable version of user for cache.
+
+    Bump VERSION whenever the fields change: it is part of the cache key, so
+    instances running different shapes never read each other's records.
+    """
+    VERSION: ClassVar[int] = 2
+
     id: str
     full_name: str
     email: str
     role: str          # or use enum value
+    is_active: bool
+    created_at: str | None  # ISO 8601
     # IMPORTANT: do NOT cache sensitive fields like hashed_password!
-    # created_at, updated_at, is_active, etc. — only what you really need
 
     @classmethod
     def from_orm(cls, user: User) -> Self:
@@ -28,15 +61,19 @@ class CachedUser:
             full_name=user.full_name,
             email=user.email,
             role=user.role.value if hasattr(user.role, 'value') else user.role,
+            is_active=user.is_active,
+            created_at=user.created_at.isoformat() if user.created_at else None,
         )
 
     def to_user(self) -> User:
-        """Only used in rare cases — prefer passing CachedUser around when possible"""
+        """Detached read-only User; write paths must load the row from the session"""
         return User(
             id=self.id,
             full_name=self.full_name,
             email=self.email,
             role=self.role,
+            is_active=self.is_active,
+            created_at=datetime.fromisoformat(self.created_at) if self.created_at else None,
             # IMPORTANT: do NOT reconstruct hashed_password or other sensitive/internal fields
         )
 
@@ -46,88 +83,215 @@ class UserRepository:
     Responsibilities:
     - CRUD for users
     - Read-through caching for hot paths (get by id, get by email)
-    - Proper cache invalidation on write
+    - Coalescing of concurrent cache misses for the same key (single flight)
+    - Stale-while-revalidate: past CACHE_SOFT_TTL (or earlier, XFetch-style)
+      the cached user is still served while one background task reloads it
+    - Negative caching: misses leave a short-lived tombstone, and an optional
+      Bloom filter of known emails rejects most unknown emails without a GET
+    - The email key only points at the user id; the record lives under the id key
+    - Hot-key tracking of get_by_id and batch warming of the hottest users
+    - Background replacement of outdated password hashes after a login
+    - Revocation of stateless tokens when role, active state or password change
+    - Proper cache invalidation on write (including cached bearer-token principals)
     """
 
     CACHE_TTL = 300          # move to config or env
+    CACHE_SOFT_TTL = 240
+    CACHE_REFRESH_BETA = 1.0
+    CACHE_NEGATIVE_TTL = settings.cache_negative_ttl_seconds
     CACHE_KEY_PREFIX = "user"
+    TOKEN_CLAIM_FIELDS = frozenset({"role", "is_active", "hashed_password"})
 
-    def __init__(self, session: AsyncSession, cache_backend: CacheBackend = cache):
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache_backend: CacheBackend = cache,
+        flight: SingleFlight = single_flight,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        email_filter: BloomFilter | None = email_filter,
+        hot_keys: HotKeyTracker | None = user_hot_keys,
+        principals: PrincipalCache | None = principal_cache,
+        revocations: TokenRevocations | None = token_revocations,
+    ):
         self.session = session
         self.cache = cache_backend
-
+        self.flight = flight
+        self.session_factory = session_factory
+        self.email_filter = email_filter
+        self.hot_keys = hot_keys
+        self.principals = principals
+        self.revocations = revocations
+
+    # The id key, its generation-prefixed form and its single-flight lock share a cluster slot.
+    # The email pointer is tagged by email (it is looked up before the id is known), so it lives
+    # in another slot: never touch both in one multi-key command.
+    # Both carry the CachedUser schema version (user:s2:{42}, user:s2:email:{a@b.c}).
     def _user_key(self, user_id: str) -> str:
-        return f"{self.CACHE_KEY_PREFIX}:{user_id}"
+        return make_key(self.CACHE_KEY_PREFIX, f"s{CachedUser.VERSION}", tag=user_id)
 
     def _email_key(self, email: str) -> str:
-        return f"{self.CACHE_KEY_PREFIX}:email:{email.lower()}"
+        return make_key(
+            self.CACHE_KEY_PREFIX, f"s{CachedUser.VERSION}", "email", tag=email.lower()
+        )
 
-    async def get_by_id(self, user_id: str) -> User | None:
-        key = self._user_key(user_id)
+    async def _get_cached(self, key: str, criterion=None) -> User | object | None:
+        """Cached user, ``_MISSING`` for a tombstone, or None on a cache miss."""
+        entry = await self.cache.get_entry(key)
+        if entry is None or entry.value is None:
+            return None
+        if entry.value == TOMBSTONE:
+            return _MISSING
+        if criterion is not None and entry.should_refresh(self.CACHE_REFRESH_BETA):
+            self.flight.spawn(f"refresh:{key}", lambda: self._refresh(criterion))
+        try:
+            return CachedUser(**entry.value).to_user()
+        except (TypeError, KeyError):
+            await self.cache.delete(key)   # corrupt cache → remove
+            return None
+
+    async def _adopt(self, user: User | None) -> User | None:
+        """Attach a user loaded by another request's session to this one."""
+        if user is None:
+            return None
+        state = inspect(user)
+        if state.persistent and state.session is not self.session.sync_session:
+            return await self.session.merge(user, load=False)
+        return user
 
-        # Cache hit
-        cached = await self.cache.get(key)
-        if cached is not None:
-            try:
-                return CachedUser(**cached).to_user()
-            except (TypeError, KeyError):
-                await self.cache.delete(key)   # corrupt cache → remove
-                # continue to DB
-
-        # Cache miss → DB
-        result = await self.session.execute(
-            select(User).where(User.id == user_id)
-        )
+    async def _load(self, criterion, key: str | None = None) -> User | None:
+        started = time.perf_counter()
+        result = await self.session.execute(select(User).where(criterion))
         user = result.scalar_one_or_none()
 
         if user:
-            await self._cache_user(user)
+            await self._cache_user(user, delta=time.perf_counter() - started)
+        elif key is not None:
+            await self.cache.set(key, TOMBSTONE, ttl=self.CACHE_NEGATIVE_TTL)
 
         return user
 
+    async def _refresh(self, criterion) -> None:
+        """Reload and re-cache a user outside the request (its session may be gone)."""
+        async with self.session_factory() as session:
+            repository = UserRepository(
+                session,
+                self.cache,
+                self.flight,
+                self.session_factory,
+                self.email_filter,
+                self.hot_keys,
+                self.principals,
+                self.revocations,
+            )
+            await repository._load(criterion)
+
+    async def get_by_id(self, user_id: str) -> User | None:
+        key = self._user_key(user_id)
+        if self.hot_keys is not None:
+            self.hot_keys.record(user_id)
+
+        # Cache hit (possibly stale, with a refresh scheduled) or tombstone
+        cached = await self._get_cached(key, User.id == user_id)
+        if cached is not None:
+            return None if cached is _MISSING else cached
+
+        # Cache miss → DB, once per key for all concurrent callers
+        user = await self.flight.do(
+            key,
+            lambda: self._load(User.id == user_id, key),
+            recheck=lambda: self._get_cached(key),
+        )
+        return None if user is _MISSING else await self._adopt(user)
+
     async def get_by_email(self, email: str) -> User | None:
+        # Emails are stored lowercased; query with the same value the cache key uses
+        email = email.lower()
         key = self._email_key(email)
 
-        cached = await self.cache.get(key)
+        if self.email_filter is not None and not await self.email_filter.might_contain(email):
+            return None
+
+        cached = await self._follow_pointer(key, email)
         if cached is not None:
-            try:
-                return CachedUser(**cached).to_user()
-            except (TypeError, KeyError):
-                await self.cache.delete(key)
+            return None if cached is _MISSING else cached
 
-        result = await self.session.execute(
-            select(User).where(User.email == email)
+        user = await self.flight.do(
+            key,
+            lambda: self._load(User.email == email, key),
+            recheck=lambda: self._follow_pointer(key, email),
         )
-        user = result.scalar_one_or_none()
+        return None if user is _MISSING else await self._adopt(user)
+
+    async def _follow_pointer(self, key: str, email: str) -> User | object | None:
+        """Resolve a cached email → id pointer through get_by_id (same contract as _get_cached)."""
+        pointer = await self.cache.get(key)
+        if pointer == TOMBSTONE:
+            return _MISSING
+        if not isinstance(pointer, str):
+            return None
+        user = await self.get_by_id(pointer)
+        if user is None or user.email.lower() != email.lower():
+            return None   # dangling pointer → reload by email
+        return user
 
-        if user:
-            await self._cache_user(user)
-            # Also cache by email
-            await self.cache.set(key, asdict(CachedUser.from_orm(user)), ttl=self.CACHE_TTL)
+    async def get_with_credentials(self, email: str) -> User | None:
+        """Load a user with its password hash, bypassing the cache (which never holds it)."""
+        result = await self.session.execute(select(User).where(User.email == email.lower()))
+        return result.scalar_one_or_none()
 
-        return user
+    def schedule_password_rehash(self, user_id: str, old_hash: str, new_hash: str) -> None:
+        """Store an upgraded password hash in the background, with its own session."""
+        self.flight.spawn(
+            f"rehash:{user_id}", lambda: self._replace_password_hash(user_id, old_hash, new_hash)
+        )
+
+    async def _replace_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> None:
+        # Compare-and-set: a password changed in the meantime must not be overwritten
+        async with self.session_factory() as session:
+            await session.execute(
+                update(User)
+                .where(User.id == user_id, User.hashed_password == old_hash)
+                .values(hashed_password=new_hash)
+            )
+            await session.commit()
+
+    def _cache_items(self, user: User) -> dict[str, Any]:
+        cu = CachedUser.from_orm(user)
+
+        items: dict[str, Any] = {self._user_key(user.id): asdict(cu)}
+        # Email lookups get a pointer to the id key, not a second copy of the record
+        if user.email:
+            items[self._email_key(user.email)] = user.id
+        return items
 
-    async def _cache_user(self, user: User) -> None:
+    async def _cache_user(self, user: User, delta: float = 0.0) -> None:
         """Central place to cache a user (used by both get_by_id and get_by_email)"""
         if not user.id:
             return
 
-        cu = CachedUser.from_orm(user)
-        data = asdict(cu)
-
-        await self.cache.set(
-            self._user_key(user.id),
-            data,
-            ttl=self.CACHE_TTL
+        await self.cache.set_many(
+            self._cache_items(user), ttl=self.CACHE_TTL, soft_ttl=self.CACHE_SOFT_TTL, delta=delta
         )
 
-        # Also cache by email (write-through style for email lookups)
-        if user.email:
-            await self.cache.set(
-                self._email_key(user.email),
-                data,
-                ttl=self.CACHE_TTL
+    async def warm(self, user_ids: list[str], batch_size: int = 500) -> int:
+        """(Re)cache the given users in batches; returns how many were found."""
+        warmed = 0
+        for start in range(0, len(user_ids), batch_size):
+            started = time.perf_counter()
+            result = await self.session.execute(
+                select(User).where(User.id.in_(user_ids[start:start + batch_size]))
             )
+            items: dict[str, Any] = {}
+            for user in result.scalars():
+                items.update(self._cache_items(user))
+                warmed += 1
+            await self.cache.set_many(
+                items,
+                ttl=self.CACHE_TTL,
+                soft_ttl=self.CACHE_SOFT_TTL,
+                delta=time.perf_counter() - started,
+            )
+        return warmed
 
     async def create(
         self,
@@ -143,52 +307,142 @@ class UserRepository:
             role=role,
         )
 
+        # Before the commit: a false positive is harmless, a false negative is not.
+        if self.email_filter is not None:
+            await self.email_filter.add(user.email)
+
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
 
+        # Also clears tombstones left by lookups of the new id/email
         await self._invalidate_user_caches(user)
 
         return user
 
     async def _invalidate_user_caches(self, user: User) -> None:
         """Called after every write operation"""
+        keys = []
+        # Tags of results cached with @cached (e.g. UserMediator.get_user / list_users)
+        tags = ["users"]
         if user.id:
-            await self.cache.delete(self._user_key(user.id))
+            keys.append(self._user_key(user.id))
+            tags.append(f"user:{user.id}")
 
         if user.email:
-            await self.cache.delete(self._email_key(user.email))
+            keys.append(self._email_key(user.email))
+
+        await self.cache.delete_many(keys)
+        await self.cache.invalidate_tags(*tags)
+        # Tokens verified for this user on any worker must see the new role/state
+        if self.principals is not None and user.id:
+            await self.principals.evict_user(user.id)
 
     async def update(self, user_id: str, updates: dict[str, Any]) -> User:
-        user = await self.get_by_id(user_id)
+        # Writes need the session-bound row, never a cached copy
+        user = await self.session.get(User, user_id)
         if not user:
             return None  # or raise
+        previous_email = user.email
 
         # Check email uniqueness if email is being updated
         if 'email' in updates:
+            updates = {**updates, 'email': updates['email'].lower()}
             existing = await self.get_by_email(updates['email'])
             if existing and existing.id != user_id:
                 raise ValueError("Email already in use")
 
+        if 'email' in updates and self.email_filter is not None:
+            await self.email_filter.add(updates['email'])
+
+        # Stateless tokens carry these claims, so changing them must revoke the old tokens
+        revoke = any(
+            getattr(user, key) != value
+            for key, value in updates.items()
+            if key in self.TOKEN_CLAIM_FIELDS
+        )
         for key, value in updates.items():
             if hasattr(user, key):
                 setattr(user, key, value)
 
         await self.session.commit()
         await self.session.refresh(user)
+        if revoke:
+            await self._revoke_tokens(user.id)
         await self._invalidate_user_caches(user)
+        if previous_email != user.email:
+            await self.cache.delete(self._email_key(previous_email))
 
         return user
 
-    async def list(self) -> list[User]:
-        result = await self.session.execute(select(User))
-        return result.scalars().all()
+    async def _revoke_tokens(self, user_id: str) -> None:
+        # The change is already committed; a failed revocation is retried by the next sync
+        if self.revocations is None:
+            return
+        try:
+            await self.revocations.revoke(user_id)
+        except Exception as e:
+            logger.warning(f"Token revocation failed for user {user_id}: {e}")
+
+    async def rebuild_email_filter(self) -> int:
+        """Load every existing email into the Bloom filter and mark it ready."""
+        if self.email_filter is None:
+            return 0
+        emails = await self.session.stream_scalars(select(User.email))
+        return await self.email_filter.rebuild(email.lower() async for email in emails)
+
+    async def list_page(
+        self,
+        limit: int,
+        after: tuple[datetime, str] | None = None,
+        role: User.Role | None = None,
+        is_active: bool | None = None,
+    ) -> list[User]:
+        """Up to ``limit`` users ordered by (created_at, id), strictly after the ``after`` key."""
+        query = select(User)
+        if role is not None:
+            query = query.where(User.role == role)
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+        if after is not None:
+            # Row comparison, so Postgres seeks the (…, created_at, id) index instead of offsetting
+            query = query.where(tuple_(User.created_at, User.id) > tuple_(*after))
+        query = query.order_by(User.created_at, User.id).limit(limit)
+        result = await self.session.execute(query)
+        return list(result.scalars())
+
+    async def stream_chunks(
+        self,
+        chunk_size: int = 1000,
+        role: User.Role | None = None,
+        is_active: bool | None = None,
+    ) -> AsyncIterator[list[User]]:
+        """Yield every matching user in (created_at, id) order, ``chunk_size`` rows at a time.
+
+        Rows come from a server-side cursor, and each chunk is expunged once the
+        caller resumes, so memory stays bounded by the chunk size.
+        """
+        query = select(User).order_by(User.created_at, User.id)
+        if role is not None:
+            query = query.where(User.role == role)
+        if is_active is not None:
+            query = query.where(User.is_active == is_active)
+
+        result = await self.session.stream_scalars(query.execution_options(yield_per=chunk_size))
+        try:
+            async for chunk in result.partitions():
+                yield chunk
+                for user in chunk:
+                    self.session.expunge(user)
+        finally:
+            await result.close()
 
     async def delete(self, user_id: str) -> bool:
-        user = await self.get_by_id(user_id)
+        user = await self.session.get(User, user_id)
         if not user:
             return False
         await self.session.delete(user)
         await self.session.commit()
+        await self._revoke_tokens(user.id)
         await self._invalidate_user_caches(user)
         return True
\ No newline at end of file
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class HotKey(BaseModel):
+    key: str
+    count: int
+
+
+class HotKeysResponse(BaseModel):
+    enabled: bool
+    # Estimated hits seen by the worker that served this request
+    local: list[HotKey]
+    # Hot set shared by all workers and used for warming
+    shared: list[HotKey]
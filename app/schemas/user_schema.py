@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import StrEnum
 
 from pydantic import BaseModel, ConfigDict
 
@@ -16,6 +17,16 @@ class UserRead(BaseModel):
     created_at: datetime
 
 
+class UserPage(BaseModel):
+    items: list[UserRead]
+    next_cursor: str | None = None
+
+
+class ExportFormat(StrEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class UserUpdate(BaseModel):
     full_name: str | None = None
     email: str | None = None
@@ -1,48 +1,51 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+from datetime import UTC, datetime, timedelta
+from typing import Any
 
 import jwt
-from passlib.context import CryptContext
 
+from app.cache import token_revocations
+from app.cache.revocations import TokenRevocations
 from app.core.config import settings
 from app.core.errors import ConflictError, UnauthorizedError
+from app.core.passwords import PasswordHasher, password_hasher
 from app.models.user import User
 from app.repositories.user_repository import UserRepository
 
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"],
-    default="pbkdf2_sha256",
-    deprecated="auto",
-)
-
 
 class AuthService:
     """Authentication actions that rely on the unified `User` model."""
 
-    def __init__(self, repository: UserRepository) -> None:
+    def __init__(
+        self,
+        repository: UserRepository,
+        hasher: PasswordHasher = password_hasher,
+        revocations: TokenRevocations | None = token_revocations,
+    ) -> None:
         self.repository = repository
+        self.hasher = hasher
+        self.revocations = revocations
 
     # ------------------------------------------------------------------
-    # Password helpers
+    # Password helpers (run in the hasher's executor, not on the event loop)
     # ------------------------------------------------------------------
-    @staticmethod
-    def hash_password(password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await self.hasher.hash(password)
 
-    @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self.hasher.verify(plain_password, hashed_password)
 
     # ------------------------------------------------------------------
     # JWT helpers
     # ------------------------------------------------------------------
     @staticmethod
-    def create_access_token(subject: str) -> str:
-        now = datetime.now(timezone.utc)
+    def create_access_token(subject: str, claims: dict[str, Any] | None = None) -> str:
+        now = datetime.now(UTC)
         expires = now + timedelta(minutes=settings.jwt_access_token_expires_minutes)
 
         payload = {
+            **(claims or {}),
             "sub": subject,
             "iat": now,
             "exp": expires,
@@ -50,6 +53,20 @@ class AuthService:
 
         return jwt.encode(payload, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
+    async def issue_access_token(self, user: User) -> str:
+        """Access token for ``user``; with revocations it carries role/active/version claims."""
+        version = None
+        if self.revocations is not None:
+            version = await self.revocations.current_version(user.id)
+        if version is None:
+            # Plain token: authorization falls back to looking the user up
+            return self.create_access_token(str(user.id))
+
+        role = user.role.value if hasattr(user.role, "value") else user.role
+        return self.create_access_token(
+            str(user.id), {"role": role, "active": user.is_active, "ver": version}
+        )
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
@@ -65,7 +82,7 @@ class AuthService:
         if existing_user:
             raise ConflictError(message="Email already exists")
 
-        hashed_password = self.hash_password(password)
+        hashed_password = await self.hash_password(password)
         return await self.repository.create(
             full_name=full_name,
             email=email,
@@ -75,11 +92,16 @@ class AuthService:
 
     async def authenticate(self, email: str, password: str) -> User:
         """Validate credentials and return the active user."""
-        user = await self.repository.get_by_email(email)
+        user = await self.repository.get_with_credentials(email)
         if not user or not user.is_active:
             raise UnauthorizedError(message="Invalid credentials")
 
-        if not self.verify_password(password, user.hashed_password):
+        valid, new_hash = await self.hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
             raise UnauthorizedError(message="Invalid credentials")
 
+        # Outdated scheme or rounds: store the upgraded hash without delaying the login
+        if new_hash is not None:
+            self.repository.schedule_password_rehash(user.id, user.hashed_password, new_hash)
+
         return user
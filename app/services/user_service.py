@@ -1,5 +1,9 @@
+from collections.abc import AsyncIterator
+from datetime import datetime
 from typing import Any
 
+from app.core.errors import BadRequestError, NotFoundError
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.user import User
 from app.repositories.user_repository import UserRepository
 
@@ -14,8 +18,29 @@ class UserService:
             raise NotFoundError(message="User not found")
         return user
 
-    async def list_users(self) -> list[User]:
-        return await self.repository.list()
+    async def list_users(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        role: User.Role | None = None,
+        is_active: bool | None = None,
+    ) -> tuple[list[User], str | None]:
+        """One page of users and the cursor of the next page (None on the last page)."""
+        after = None
+        if cursor is not None:
+            created_at, user_id = decode_cursor(cursor, 2)
+            try:
+                after = (datetime.fromisoformat(created_at), str(user_id))
+            except (TypeError, ValueError) as exc:
+                raise BadRequestError(message="Invalid cursor") from exc
+
+        # One extra row tells whether another page follows
+        users = await self.repository.list_page(limit + 1, after, role=role, is_active=is_active)
+        if len(users) <= limit:
+            return users, None
+        users = users[:limit]
+        last = users[-1]
+        return users, encode_cursor(last.created_at.isoformat(), last.id)
 
     async def update_user(self, user_id: str, updates: dict[str, Any]) -> User:
         user = await self.repository.update(user_id, updates)
@@ -25,3 +50,11 @@ class UserService:
 
     async def delete_user(self, user_id: str) -> bool:
         return await self.repository.delete(user_id)
+
+    def stream_users(
+        self,
+        chunk_size: int,
+        role: User.Role | None = None,
+        is_active: bool | None = None,
+    ) -> AsyncIterator[list[User]]:
+        return self.repository.stream_chunks(chunk_size, role=role, is_active=is_active)
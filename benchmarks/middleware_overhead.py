@@ -0,0 +1,119 @@
+"""Measure per-request overhead of the RequestId + RateLimit middleware stack.
+
+Compares the previous `BaseHTTPMiddleware` implementations with the pure ASGI
+ones by driving a trivial ASGI app directly (no network, no Redis).
+
+Run with:
+    python -m benchmarks.middleware_overhead
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+
+from app.core.logging import request_id_ctx_var
+from app.core.rate_limiter import RateLimitResult
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.request_id import RequestIdMiddleware
+
+REQUESTS = 20_000
+
+
+class AllowAllLimiter:
+    """Limiter stub so the benchmark measures middleware cost, not Redis."""
+    max_requests = 100
+    window_seconds = 60
+    _result = RateLimitResult(allowed=True, limit=100, remaining=99, retry_after=0.0)
+
+    async def check(self, client_id: str) -> RateLimitResult:
+        return self._result
+
+    def with_limits(self, max_requests: int, window_seconds: int) -> AllowAllLimiter:
+        return self
+
+
+class LegacyRequestIdMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+        token = request_id_ctx_var.set(request_id)
+        try:
+            response = await call_next(request)
+        finally:
+            request_id_ctx_var.reset(token)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, rate_limiter, exempt_routes):
+        super().__init__(app)
+        self.rate_limiter = rate_limiter
+        self.exempt_routes = exempt_routes
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in self.exempt_routes:
+            return await call_next(request)
+        result = await self.rate_limiter.check(request.client.host if request.client else "unknown")
+        response = await call_next(request)
+        response.headers.update(result.headers)
+        return response
+
+
+async def endpoint(scope, receive, send) -> None:
+    await PlainTextResponse("ok")(scope, receive, send)
+
+
+def build_stack(legacy: bool):
+    limiter = AllowAllLimiter()
+    if legacy:
+        app = LegacyRateLimitMiddleware(endpoint, rate_limiter=limiter, exempt_routes=[])
+        return LegacyRequestIdMiddleware(app)
+    app = RateLimitMiddleware(endpoint, rate_limiter=limiter, exempt_routes=[])
+    return RequestIdMiddleware(app)
+
+
+async def drive(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/bench",
+        "raw_path": b"/bench",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    baseline = await drive(endpoint, REQUESTS)
+    for label, legacy in (("BaseHTTPMiddleware", True), ("pure ASGI", False)):
+        app = build_stack(legacy)
+        await drive(app, 1_000)  # warm up
+        elapsed = await drive(app, REQUESTS)
+        overhead_us = (elapsed - baseline) / REQUESTS * 1e6
+        per_request_us = elapsed / REQUESTS * 1e6
+        print(f"{label:>20}: {per_request_us:8.1f} us/request ({overhead_us:6.1f} us overhead)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
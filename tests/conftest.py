@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import contextmanager
 
+import fakeredis.aioredis
+import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 
+from app.cache import Cache
 from app.db.base import Base
 import app.models  # noqa: F401
 from app.db.session import get_db_session
@@ -57,3 +62,43 @@ async def client(async_engine) -> AsyncGenerator[AsyncClient, None]:
         yield http_client
 
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def redis_provider():
+    """``redis_provider(client)`` returns the async client provider cache components take."""
+
+    def make(client):
+        async def get_client():
+            return client
+
+        return get_client
+
+    return make
+
+
+@pytest.fixture
+def cache(redis_provider) -> Cache:
+    """A `Cache` on its own empty fake Redis."""
+    return Cache(redis_provider(fakeredis.aioredis.FakeRedis()))
+
+
+@pytest.fixture
+def count_selects(async_engine):
+    """``with count_selects() as selects:`` collects the SELECTs run on the test engine."""
+
+    @contextmanager
+    def counting() -> Iterator[list[str]]:
+        selects: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany) -> None:
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield selects
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    return counting
@@ -1,15 +1,37 @@
 import asyncio
+import json
+import time
 
 import fakeredis.aioredis
 import pytest
+from prometheus_client import REGISTRY
+from pydantic import BaseModel
+from redis.asyncio import BlockingConnectionPool
+from redis.crc import key_slot
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.cache import Cache
+from app.cache import Cache, ModelCodec, cached
+from app.cache.clients import PoolConfig, RedisClientManager
+from app.cache.codec import CacheCodec
+from app.cache.entry import CacheEntry
+from app.cache.hotkeys import HotKeyTracker
+from app.cache.keys import make_key
+from app.cache.local import LocalCache
+from app.cache.principals import PrincipalCache
+from app.cache.revocations import TokenRevocations
+from app.cache.singleflight import SingleFlight
+from app.repositories.user_repository import UserRepository
+
+
+def _requests(tier: str, result: str) -> float:
+    value = REGISTRY.get_sample_value("app_cache_requests_total", {"tier": tier, "result": result})
+    return value or 0.0
 
 
 @pytest.mark.asyncio
-async def test_cache_set_get_delete():
+async def test_cache_set_get_delete(redis_provider):
     redis_client = fakeredis.aioredis.FakeRedis()
-    cache = Cache(lambda: asyncio.sleep(0) or redis_client)
+    cache = Cache(redis_provider(redis_client))
 
     await cache.set("foo", {"bar": 1}, ttl=5)
     value = await cache.get("foo")
@@ -17,3 +39,424 @@ async def test_cache_set_get_delete():
 
     await cache.delete("foo")
     assert await cache.get("foo") is None
+
+
+@pytest.mark.asyncio
+async def test_hash_tagged_keys_share_a_cluster_slot(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client), namespaces=["user"])
+    key = make_key("user", tag="42")
+    assert key == "user:{42}"
+    assert make_key("user", "email", tag="a@example.com") == "user:email:{a@example.com}"
+
+    physical = await cache._resolve(redis_client, key)
+    assert physical == "user:v0:{42}"
+    related = (key, physical, f"lock:{key}", make_key("profile", tag="42"))
+    assert len({key_slot(k.encode()) for k in related}) == 1
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_caps_lifetime_by_token_expiry_and_evicts_by_user():
+    principals = PrincipalCache(max_entries=10, ttl=60)
+    principals.set("token-a", "u1", "alice", expires_at=time.time() + 60)
+    principals.set("token-b", "u1", "alice", expires_at=time.time() - 1)
+    principals.set("token-c", "u2", "bob")
+
+    assert principals.get("token-a") == "alice"
+    assert principals.get("token-b") is None          # already expired, never stored
+    assert "token-a" not in principals._entries._entries  # keyed by digest only
+
+    assert await principals.evict_user("u1") == 1
+    assert principals.get("token-a") is None
+    assert principals.get("token-c") == "bob"
+    assert set(principals._by_user) == {"u2"}
+
+
+@pytest.mark.asyncio
+async def test_principal_evictions_reach_other_workers_and_index_follows_lru(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    get_client = redis_provider(redis_client)
+    first = PrincipalCache(max_entries=2, client_provider=get_client, channel="inv")
+    second = PrincipalCache(max_entries=2, client_provider=get_client, channel="inv")
+    listener = asyncio.create_task(second.listen_for_evictions())
+    await asyncio.sleep(0.05)
+
+    second.set("token-a", "u1", "alice")
+    second.set("token-b", "u2", "bob")
+    await first.evict_user("u1")
+    for _ in range(50):
+        if second.get("token-a") is None:
+            break
+        await asyncio.sleep(0.01)
+    assert second.get("token-a") is None
+    assert second.get("token-b") == "bob"
+
+    # Entries pushed out by the size bound leave the index too
+    second.set("token-c", "u3", "carol")
+    second.set("token-d", "u4", "dave")
+    assert set(second._by_user) == {"u3", "u4"}
+    listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_token_revocations_sync_filter_across_workers(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    first = TokenRevocations(redis_provider(redis_client), capacity=1000)
+    second = TokenRevocations(redis_provider(redis_client), capacity=1000)
+
+    # Not synced yet: everyone may be revoked, so the version is checked
+    assert second.maybe_revoked("u1") is True
+    await first.sync()
+    await second.sync()
+    assert second.maybe_revoked("u1") is False
+    assert await first.current_version("u1") == 0
+
+    assert await first.revoke("u1") == 1
+    assert first.maybe_revoked("u1") is True
+    assert await first.is_current("u1", 0) is False
+    assert await first.is_current("u1", 1) is True
+
+    # Other workers see the revocation after their next sync
+    assert await second.is_current("u1", 0) is True
+    await second.sync()
+    assert await second.is_current("u1", 0) is False
+    assert second.maybe_revoked("u2") is False
+
+
+def test_local_cache_evicts_least_recently_used_and_expired():
+    local = LocalCache(max_entries=2, ttl=60)
+    local.set("a", 1)
+    local.set("b", 2)
+    assert local.get("a") == 1
+    local.set("c", 3)
+    assert local.get("b") is None
+    assert local.get("a") == 1
+
+    local.set("d", 4, ttl=0)
+    assert local.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_local_tier_serves_repeat_reads(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client), local=LocalCache(max_entries=10, ttl=60))
+    await redis_client.set("user:1", '{"id": "1"}')
+
+    local_hits, redis_hits = _requests("local", "hit"), _requests("redis", "hit")
+    assert await cache.get("user:1") == {"id": "1"}
+    await redis_client.delete("user:1")
+    assert await cache.get("user:1") == {"id": "1"}
+
+    assert _requests("redis", "hit") == redis_hits + 1
+    assert _requests("local", "hit") == local_hits + 1
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidation_is_broadcast_to_other_workers(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    get_client = redis_provider(redis_client)
+    writer = Cache(get_client, local=LocalCache(ttl=60), invalidation_channel="inv")
+    reader = Cache(get_client, local=LocalCache(ttl=60), invalidation_channel="inv")
+    listener = asyncio.create_task(reader.listen_for_invalidations())
+    await asyncio.sleep(0.05)
+
+    try:
+        await writer.set("user:1", {"name": "old"}, ttl=60)
+        assert await reader.get("user:1") == {"name": "old"}
+
+        await writer.set("user:1", {"name": "new"}, ttl=60)
+        await asyncio.sleep(0.05)
+        assert await reader.get("user:1") == {"name": "new"}
+
+        await writer.delete("user:1")
+        await asyncio.sleep(0.05)
+        assert await reader.get("user:1") is None
+    finally:
+        listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_cache_batch_operations(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client))
+
+    await cache.set_many({"user:1": {"id": 1}, "user:2": {"id": 2}}, ttl=30)
+    assert 0 < await redis_client.ttl("user:2") <= 30
+
+    found = await cache.get_many(["user:1", "user:2", "user:3", "user:1"])
+    assert found == {"user:1": {"id": 1}, "user:2": {"id": 2}}
+
+    await cache.delete_many(["user:1", "user:2"])
+    assert await cache.get_many(["user:1", "user:2"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_cache_batch_operations_with_local_tier(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client), local=LocalCache(ttl=60))
+
+    await cache.set_many({"a": 1, "b": 2})
+    await redis_client.delete("a")
+    assert await cache.get_many(["a", "b"]) == {"a": 1, "b": 2}
+
+    await cache.delete_many(["a", "b"])
+    assert await cache.get_many(["a", "b"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_cache_namespace_invalidation_bumps_generation(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client), namespaces=["user"])
+
+    await cache.set("user:1", {"id": 1})
+    await cache.set("other:1", {"id": 1})
+    assert await redis_client.exists("user:v0:1")
+
+    assert await cache.invalidate_namespace("user") == 1
+    assert await cache.get("user:1") is None
+    assert await cache.get("other:1") == {"id": 1}
+
+    await cache.set("user:1", {"id": 2})
+    assert await cache.get("user:1") == {"id": 2}
+    assert await redis_client.exists("user:v1:1")
+
+
+@pytest.mark.asyncio
+async def test_cache_namespace_invalidation_reaches_other_workers(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    writer = Cache(redis_provider(redis_client), namespaces=["user"], generation_ttl=0)
+    reader = Cache(redis_provider(redis_client), namespaces=["user"], generation_ttl=0)
+
+    await writer.set("user:1", {"id": 1})
+    assert await reader.get("user:1") == {"id": 1}
+    await writer.invalidate_namespace("user")
+    assert await reader.get("user:1") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_delete_pattern_streams_with_scan(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client))
+    await cache.set_many({f"session:{i}": i for i in range(25)})
+    await cache.set("keep:1", 1)
+
+    assert await cache.delete_pattern("session:*", batch_size=10) == 25
+    assert await redis_client.dbsize() == 1
+
+
+@pytest.mark.parametrize(
+    "serializer,compression",
+    [("json", None), ("json", "zstd"), ("msgpack", None), ("msgpack", "lz4")],
+)
+def test_cache_codec_round_trip(serializer, compression):
+    if serializer == "msgpack":
+        pytest.importorskip("msgpack")
+    if compression:
+        pytest.importorskip({"zstd": "zstandard", "lz4": "lz4"}[compression])
+    codec = CacheCodec(serializer, compression, compress_threshold=64)
+
+    small = {"id": "1", "email": "a@example.com"}
+    large = {"items": ["x" * 10] * 100}
+    assert codec.decode(codec.encode(small)) == small
+    assert codec.decode(codec.encode(large)) == large
+    if compression:
+        assert len(codec.encode(large)) < len(json.dumps(large))
+
+
+def test_cache_codec_reads_legacy_json_entries():
+    codec = CacheCodec()
+    assert codec.decode(b'{"id": 1}') == {"id": 1}
+    assert codec.decode('"text"') == "text"
+
+
+@pytest.mark.asyncio
+async def test_cache_reads_entries_written_by_other_codecs(redis_provider):
+    pytest.importorskip("msgpack")
+    redis_client = fakeredis.aioredis.FakeRedis()
+    old = Cache(redis_provider(redis_client))
+    new = Cache(redis_provider(redis_client), codec=CacheCodec("msgpack"))
+
+    await redis_client.set("legacy", '{"id": 0}')
+    await old.set("json", {"id": 1})
+    await new.set("msgpack", {"id": 2})
+
+    assert await new.get_many(["legacy", "json", "msgpack"]) == {
+        "legacy": {"id": 0},
+        "json": {"id": 1},
+        "msgpack": {"id": 2},
+    }
+
+
+def test_cache_tracking_message_evicts_keys_and_generations():
+    cache = Cache(local=LocalCache(ttl=60), namespaces=["user"], tracking_prefixes=["user:"])
+    cache.local.set("user:v1:1", {"id": "1"})
+    cache.local.set("user:v1:2", {"id": "2"})
+    cache._generations["user"] = (float("inf"), 1)
+
+    cache._handle_tracking([b"message", b"__redis__:invalidate", [b"user:v1:1", b"cache:gen:user"]])
+    assert cache.local.get("user:v1:1") is None
+    assert cache.local.get("user:v1:2") == {"id": "2"}
+    assert "user" not in cache._generations
+
+    cache._handle_tracking([b"message", b"__redis__:invalidate", None])
+    assert len(cache.local) == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_tracking_falls_back_to_pubsub(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    get_client = redis_provider(redis_client)
+    writer = Cache(get_client, local=LocalCache(ttl=60), invalidation_channel="inv")
+    reader = Cache(
+        get_client,
+        local=LocalCache(ttl=60),
+        invalidation_channel="inv",
+        tracking_prefixes=["user:"],
+    )
+    listener = asyncio.create_task(reader.listen_for_invalidations())
+    await asyncio.sleep(0.05)
+
+    try:
+        assert not reader._tracking
+        await writer.set("user:1", {"name": "old"}, ttl=60)
+        assert await reader.get("user:1") == {"name": "old"}
+        await writer.set("user:1", {"name": "new"}, ttl=60)
+        await asyncio.sleep(0.05)
+        assert await reader.get("user:1") == {"name": "new"}
+    finally:
+        listener.cancel()
+
+
+class _Item(BaseModel):
+    id: int
+    name: str
+
+
+@pytest.mark.asyncio
+async def test_cached_decorator_keys_by_arguments_and_invalidates_by_tag(redis_provider):
+    redis_client = fakeredis.aioredis.FakeRedis()
+    cache = Cache(redis_provider(redis_client))
+    calls: list[int] = []
+
+    class Service:
+        @cached(ttl=60, tags=("item:{item_id}", "items"), codec=ModelCodec(_Item), backend=cache)
+        async def get_item(self, item_id: int, suffix: str = "") -> _Item:
+            calls.append(item_id)
+            return _Item(id=item_id, name=f"item-{item_id}{suffix}")
+
+    service = Service()
+    assert await service.get_item(1) == _Item(id=1, name="item-1")
+    assert await Service().get_item(item_id=1, suffix="") == _Item(id=1, name="item-1")
+    assert await service.get_item(2) == _Item(id=2, name="item-2")
+    assert calls == [1, 2]
+
+    await cache.invalidate_tags("item:1")
+    await service.get_item(1)
+    await service.get_item(2)
+    assert calls == [1, 2, 1]
+
+    await cache.invalidate_tags("items")
+    await service.get_item(2)
+    assert calls == [1, 2, 1, 2]
+
+    # Arguments that cannot be part of a key skip the cache instead of failing
+    assert await service.get_item(3, suffix=object()) is not None
+    await service.get_item(3, suffix=object())
+    assert calls == [1, 2, 1, 2, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_redis_client_manager_isolates_bounded_pools():
+    manager = RedisClientManager(
+        "redis://localhost:6379/0",
+        {"limiter": PoolConfig(max_connections=3, socket_timeout=0.25), "pubsub": PoolConfig()},
+    )
+    limiter = await manager.get("limiter")
+    assert await manager.provider("limiter")() is limiter
+    assert await manager.get("pubsub") is not limiter
+
+    pool = limiter.connection_pool
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 3
+    assert pool.connection_kwargs["socket_timeout"] == 0.25
+    assert REGISTRY.get_sample_value("app_redis_pool_max_connections", {"pool": "limiter"}) == 3
+    assert REGISTRY.get_sample_value(
+        "app_redis_pool_connections", {"pool": "limiter", "state": "in_use"}
+    ) == 0
+
+    with pytest.raises(ValueError):
+        await manager.get("unknown")
+    await manager.close()
+
+
+def test_cache_entry_early_refresh_probability():
+    assert CacheEntry(value=1, soft_expires_at=time.time() - 1).should_refresh()
+    assert not CacheEntry(value=1, soft_expires_at=time.time() + 3600, delta=0.01).should_refresh()
+    assert not CacheEntry(value=1).should_refresh()
+    # A huge recompute time makes early refresh practically certain
+    assert CacheEntry(value=1, soft_expires_at=time.time() + 1, delta=1e6).should_refresh()
+
+
+def test_hot_key_tracker_keeps_the_most_frequent_items():
+    tracker = HotKeyTracker(None, "hotkeys:test", top_k=3, width=256)
+    for rank in range(1, 21):
+        for _ in range(rank):
+            tracker.record(f"user-{rank}")
+
+    assert [item for item, _ in tracker.top()] == ["user-20", "user-19", "user-18"]
+    assert tracker.estimate("user-20") >= 20
+    assert len(tracker._heap) <= 2 * tracker.top_k
+
+    tracker.decay()
+    assert tracker.estimate("user-20") < 20
+
+
+@pytest.mark.asyncio
+async def test_hot_key_flushes_sum_across_workers(redis_provider):
+    get_client = redis_provider(fakeredis.aioredis.FakeRedis())
+    first = HotKeyTracker(get_client, "hotkeys:sum", top_k=10, width=256)
+    second = HotKeyTracker(get_client, "hotkeys:sum", top_k=10, width=256)
+    for _ in range(3):
+        first.record("user-1")
+    for _ in range(2):
+        second.record("user-1")
+    second.record("user-2")
+
+    await first.flush()
+    await second.flush()
+    assert await first.load() == [("user-1", 5), ("user-2", 1)]
+
+    # Only the increase since the previous flush is added, also across a decay
+    first.decay()
+    first.record("user-1")
+    await first.flush()
+    await first.flush()
+    assert await first.load() == [("user-1", 6), ("user-2", 1)]
+
+
+@pytest.mark.asyncio
+async def test_hot_users_are_shared_and_warmed(async_engine, redis_provider, count_selects):
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    redis_client = fakeredis.aioredis.FakeRedis()
+    get_client = redis_provider(redis_client)
+
+    tracker = HotKeyTracker(get_client, "hotkeys:user", top_k=10)
+    async with session_maker() as session:
+        repository = UserRepository(session, Cache(get_client), SingleFlight(), hot_keys=tracker)
+        user = await repository.create(
+            full_name="Ada", email="ada.hot@example.com", hashed_password="x"
+        )
+        for _ in range(3):
+            await repository.get_by_id(user.id)
+
+    # Redis failover: the cache is cold, but the hot set is republished by live workers
+    await redis_client.flushdb()
+    await tracker.flush()
+    assert await tracker.claim(60) and not await tracker.claim(60)
+    cold_cache = Cache(get_client)
+    async with session_maker() as session:
+        repository = UserRepository(session, cold_cache, SingleFlight(), hot_keys=None)
+        assert await repository.warm([user_id for user_id, _ in await tracker.load()]) == 1
+        with count_selects() as selects:
+            assert (await repository.get_by_id(user.id)).full_name == "Ada"
+        assert selects == []
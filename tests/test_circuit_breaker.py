@@ -0,0 +1,184 @@
+"""Tests for the circuit breaker and the components it protects."""
+
+import time
+
+import fakeredis.aioredis
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.cache import Cache
+from app.cache.clients import REDIS_ERRORS
+from app.cache.local import LocalCache
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from app.core.rate_limiter import RateLimiter
+from app.db import session as db_session
+
+
+class _DownRedis:
+    """Client whose every command fails as if Redis were unreachable."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            self.calls += 1
+            raise RedisConnectionError("Connection refused")
+
+        if name == "register_script":
+            return lambda script: fail
+        return fail
+
+
+async def test_circuit_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_seconds=60, expected=(OSError,))
+
+    for _ in range(2):
+        with pytest.raises(OSError):
+            async with breaker.guard():
+                raise OSError("down")
+    assert breaker.state is CircuitState.open
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        async with breaker.guard():
+            pass
+    assert exc_info.value.status_code == 503
+    assert 0 < exc_info.value.retry_after <= 60
+
+    # Recovery window over: one probe goes through, the next waits for its outcome
+    breaker._opened_at -= 60
+    assert breaker.allow() is True
+    assert breaker.state is CircuitState.half_open
+    assert breaker.allow() is False
+
+    breaker.record_success()
+    assert breaker.state is CircuitState.closed
+
+
+async def test_circuit_breaker_ignores_unexpected_errors_and_reopens_on_failed_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_seconds=60, expected=(OSError,))
+
+    with pytest.raises(ValueError):
+        async with breaker.guard():
+            raise ValueError("bad input, dependency answered")
+    assert breaker.state is CircuitState.closed
+
+    breaker.record_failure()
+    breaker._opened_at -= 60
+    assert await breaker.call(_async_value("probe")) == "probe"
+    assert breaker.state is CircuitState.closed
+
+    breaker.record_failure()
+    assert await breaker.call(_async_value("live"), fallback=_async_value("fallback")) == "fallback"
+
+    breaker._opened_at -= 60
+    with pytest.raises(OSError):
+        async with breaker.guard():
+            raise OSError("still down")
+    assert breaker.state is CircuitState.open
+
+
+def _async_value(value):
+    async def func():
+        return value
+
+    return func
+
+
+async def test_cache_fails_fast_while_redis_circuit_is_open(redis_provider):
+    redis = _DownRedis()
+    breaker = CircuitBreaker(
+        "redis-test", failure_threshold=2, recovery_seconds=60, expected=REDIS_ERRORS
+    )
+    cache = Cache(redis_provider(redis), breaker=breaker)
+
+    assert await cache.get("a") is None
+    assert await cache.get("b") is None
+    assert breaker.state is CircuitState.open
+    calls = redis.calls
+
+    # Misses are served without touching Redis until the recovery window ends
+    assert await cache.get("a") is None
+    await cache.set("a", 1)
+    assert redis.calls == calls
+
+
+async def test_cache_serves_local_hits_outside_the_redis_circuit():
+    clients = [fakeredis.aioredis.FakeRedis()]
+
+    async def get_client():
+        return clients[-1]
+
+    breaker = CircuitBreaker(
+        "redis-test", failure_threshold=1, recovery_seconds=60, expected=REDIS_ERRORS
+    )
+    cache = Cache(get_client, local=LocalCache(ttl=60), namespaces=["user"], breaker=breaker)
+    await cache.set("user:1", {"name": "Ada"})
+    await cache.set("user:2", {"name": "Grace"})
+
+    # Redis goes away: the circuit opens and the memoised generation expires
+    clients.append(_DownRedis())
+    assert await cache.get("user:3") is None
+    assert breaker.state is CircuitState.open
+    cache._generations = {name: (0.0, gen) for name, (_, gen) in cache._generations.items()}
+    calls = clients[-1].calls
+    assert await cache.get("user:1") == {"name": "Ada"}
+    assert await cache.get_many(["user:1", "user:2", "user:3"]) == {
+        "user:1": {"name": "Ada"},
+        "user:2": {"name": "Grace"},
+    }
+    assert clients[-1].calls == calls
+
+    # Half-open: a local hit proves nothing about Redis, so the circuit stays half-open
+    breaker._opened_at -= 60
+    expires = time.monotonic() + 60
+    cache._generations = {name: (expires, gen) for name, (_, gen) in cache._generations.items()}
+    assert await cache.get("user:1") == {"name": "Ada"}
+    assert breaker.state is CircuitState.half_open
+
+
+async def test_rate_limiter_limits_locally_while_redis_is_down(redis_provider):
+    breaker = CircuitBreaker(
+        "limiter-test", failure_threshold=1, recovery_seconds=60, expected=REDIS_ERRORS
+    )
+    limiter = RateLimiter(
+        max_requests=2,
+        window_seconds=10,
+        client_provider=redis_provider(_DownRedis()),
+        breaker=breaker,
+    )
+
+    assert (await limiter.check("client")).allowed is True
+    assert breaker.state is CircuitState.open
+    assert (await limiter.check("client")).allowed is True
+
+    result = await limiter.check("client")
+    assert result.allowed is False
+    assert 0 < result.retry_after <= 10
+    assert (await limiter.check("other")).allowed is True
+
+
+async def test_db_breaker_counts_database_errors_only(monkeypatch):
+    expected = db_session.db_breaker.expected
+    breaker = CircuitBreaker("postgres", failure_threshold=1, expected=expected)
+    monkeypatch.setattr(db_session, "db_breaker", breaker)
+
+    # A handler timing out on something else while holding the session
+    sessions = db_session.get_db_session()
+    await anext(sessions)
+    with pytest.raises(TimeoutError):
+        await sessions.athrow(TimeoutError("upstream API timed out"))
+    assert breaker.state is CircuitState.closed
+
+    engine = create_async_engine("sqlite+aiosqlite:////nonexistent/app.db")
+    db_session.track_breaker(engine, breaker)
+    with pytest.raises(exc.OperationalError):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    await engine.dispose()
+    assert breaker.state is CircuitState.open
+
+    with pytest.raises(CircuitOpenError):
+        await anext(db_session.get_db_session())
@@ -0,0 +1,133 @@
+"""Tests for Idempotency-Key handling."""
+
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+from httpx import ASGITransport, AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.cache.clients import REDIS_ERRORS
+from app.cache.idempotency import LocalIdempotencyStore, RedisIdempotencyStore, StoredResponse
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from app.middleware.idempotency import IdempotencyMiddleware
+
+
+def _app(store, calls: list[dict], fail_first: bool = False):
+    async def register(request: Request) -> JSONResponse:
+        payload = await request.json()
+        calls.append(payload)
+        await asyncio.sleep(0.05)   # slow handler, e.g. password hashing
+        if fail_first and len(calls) == 1:
+            return JSONResponse({"error": "boom"}, status_code=503)
+        return JSONResponse({"id": len(calls), **payload}, status_code=201)
+
+    app = Starlette(routes=[Route("/register", register, methods=["POST"])])
+    return IdempotencyMiddleware(app, store=store, wait_timeout=2.0)
+
+
+async def test_concurrent_retries_run_the_request_once():
+    calls: list[dict] = []
+    transport = ASGITransport(app=_app(LocalIdempotencyStore(), calls))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        first, second = await asyncio.gather(
+            *(
+                client.post(
+                    "/register", json={"email": "a@example.com"}, headers={"Idempotency-Key": "k1"}
+                )
+                for _ in range(2)
+            )
+        )
+        later = await client.post(
+            "/register", json={"email": "a@example.com"}, headers={"Idempotency-Key": "k1"}
+        )
+
+    assert len(calls) == 1
+    for response in (first, second, later):
+        assert response.status_code == 201
+        assert response.json() == {"id": 1, "email": "a@example.com"}
+    assert later.headers["idempotent-replayed"] == "true"
+    assert sum("idempotent-replayed" in r.headers for r in (first, second)) == 1
+
+
+async def test_reused_key_with_other_body_and_unkeyed_requests():
+    calls: list[dict] = []
+    transport = ASGITransport(app=_app(LocalIdempotencyStore(), calls))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post(
+            "/register", json={"email": "a@example.com"}, headers={"Idempotency-Key": "k"}
+        )
+        reused = await client.post(
+            "/register", json={"email": "b@example.com"}, headers={"Idempotency-Key": "k"}
+        )
+        assert reused.status_code == 422
+        assert reused.json()["code"] == "idempotency_key_reused"
+        other_query = await client.post(
+            "/register?notify=false",
+            json={"email": "a@example.com"},
+            headers={"Idempotency-Key": "k"},
+        )
+        assert other_query.status_code == 422
+
+        await client.post("/register", json={"email": "c@example.com"})
+        await client.post("/register", json={"email": "c@example.com"})
+    assert len(calls) == 3
+
+
+async def test_server_errors_are_not_stored():
+    calls: list[dict] = []
+    transport = ASGITransport(app=_app(LocalIdempotencyStore(), calls, fail_first=True))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"Idempotency-Key": "k"}
+        assert (await client.post("/register", json={"n": 1}, headers=headers)).status_code == 503
+        assert (await client.post("/register", json={"n": 1}, headers=headers)).status_code == 201
+    assert len(calls) == 2
+
+
+async def test_redis_store_lets_other_workers_wait_for_the_result(redis_provider):
+    get_client = redis_provider(fakeredis.aioredis.FakeRedis())
+    first = RedisIdempotencyStore(get_client)
+    second = RedisIdempotencyStore(get_client, poll_interval=0.01)
+    assert await first.acquire("k", ttl=5) is True
+    assert await second.acquire("k", ttl=5) is False
+
+    response = StoredResponse("fp", 201, [("content-type", "application/json")], b'{"id": 1}')
+    waiter = asyncio.create_task(second.wait("k", timeout=2))
+    await asyncio.sleep(0.03)
+    await first.save("k", response, ttl=60)
+
+    assert await waiter == response
+    assert await second.get("k") == response
+    assert await second.acquire("k", ttl=5) is True   # the lock was released on save
+
+
+async def test_open_redis_circuit_runs_requests_without_idempotency():
+    calls: list[dict] = []
+    attempts = 0
+
+    async def get_client():
+        nonlocal attempts
+        attempts += 1
+        raise RedisConnectionError("Connection refused")
+
+    breaker = CircuitBreaker(
+        "redis-test", failure_threshold=1, recovery_seconds=60, expected=REDIS_ERRORS
+    )
+    store = RedisIdempotencyStore(get_client, breaker=breaker)
+    transport = ASGITransport(app=_app(store, calls))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        headers = {"Idempotency-Key": "outage"}
+        first = await client.post("/register", json={"email": "a@x.io"}, headers=headers)
+        assert breaker.state is CircuitState.open
+        second = await client.post("/register", json={"email": "a@x.io"}, headers=headers)
+
+    # Both run (no 503); the second never waited on Redis
+    assert first.status_code == second.status_code == 201
+    assert len(calls) == 2
+    assert attempts == 1
+    with pytest.raises(CircuitOpenError):
+        await store.get("outage")
@@ -0,0 +1,90 @@
+"""Tests for off-loop password hashing."""
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache.singleflight import SingleFlight
+from app.core.passwords import PasswordBusyError, PasswordHasher, build_context, calibrate
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+from app.services.auth_service import AuthService
+
+
+async def test_password_hasher_round_trip_runs_off_the_event_loop():
+    hasher = PasswordHasher(build_context(1000), max_workers=2)
+    context = hasher.context
+    threads = []
+    original_hash = context.hash
+
+    def recording_hash(password):
+        threads.append(threading.current_thread().name)
+        return original_hash(password)
+
+    context.hash = recording_hash
+    try:
+        hashed = await hasher.hash("s3cret")
+        assert await hasher.verify("s3cret", hashed) is True
+        assert await hasher.verify("wrong", hashed) is False
+        assert threads and threads[0].startswith("password-hash")
+    finally:
+        hasher.shutdown()
+
+
+async def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(build_context(1000), max_workers=1, max_pending=1)
+    release = threading.Event()
+    hasher.context.hash = lambda password: release.wait(5) and "hashed"
+
+    first = asyncio.create_task(hasher.hash("a"))
+    await asyncio.sleep(0)
+    with pytest.raises(PasswordBusyError) as exc_info:
+        await hasher.hash("b")
+    assert exc_info.value.status_code == 503
+
+    release.set()
+    assert await first == "hashed"
+    hasher.shutdown()
+
+
+async def test_verify_and_update_upgrades_weaker_hashes():
+    old = build_context(1000).hash("s3cret")
+    hasher = PasswordHasher(build_context(2000))
+
+    valid, new_hash = await hasher.verify_and_update("s3cret", old)
+    assert valid is True
+    assert new_hash is not None and "$2000$" in new_hash
+
+    assert await hasher.verify_and_update("s3cret", new_hash) == (True, None)
+    hasher.shutdown()
+
+
+def test_calibrate_scales_rounds_to_target():
+    assert calibrate(1.0, samples=1) == 10_000
+    assert calibrate(50.0, samples=1) > 10_000
+
+
+async def test_login_rehashes_outdated_password_in_background(async_engine, cache):
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    flight = SingleFlight()
+    hasher = PasswordHasher(build_context(2000))
+    old_hash = build_context(1000).hash("s3cret")
+
+    async with session_maker() as session:
+        repository = UserRepository(
+            session, cache, flight, session_maker, email_filter=None, hot_keys=None
+        )
+        user = await repository.create(
+            full_name="Ada Lovelace", email="ada.rehash@example.com", hashed_password=old_hash
+        )
+        authenticated = await AuthService(repository, hasher).authenticate(user.email, "s3cret")
+        assert authenticated.id == user.id
+        await asyncio.gather(*flight._background)
+
+    async with session_maker() as session:
+        stored = await session.get(User, user.id)
+        assert stored.hashed_password != old_hash
+        assert hasher.context.verify("s3cret", stored.hashed_password)
+    hasher.shutdown()
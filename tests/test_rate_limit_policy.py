@@ -0,0 +1,86 @@
+"""Tests for rate limit policies and the route matcher."""
+
+import fakeredis.aioredis
+import jwt
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.core.rate_limit_policy import PolicyMatcher, RateLimitPolicy
+from app.core.rate_limiter import RateLimiter
+from app.middleware.rate_limit import RateLimitMiddleware
+
+
+def test_policy_matcher_resolves_templates_and_methods():
+    login = RateLimitPolicy(
+        name="login", path="/api/v1/auth/login", methods=("post",), max_requests=5
+    )
+    me = RateLimitPolicy(name="me", path="/api/v1/users/me", max_requests=50)
+    read = RateLimitPolicy(
+        name="read", path="/api/v1/users/{user_id}", methods=("GET",), max_requests=100
+    )
+    matcher = PolicyMatcher([login, me, read])
+
+    assert matcher.match("POST", "/api/v1/auth/login") is login
+    assert matcher.match("POST", "/api/v1/auth/login/") is login
+    assert matcher.match("GET", "/api/v1/auth/login") is None
+    assert matcher.match("GET", "/api/v1/users/me") is me
+    assert matcher.match("GET", "/api/v1/users/42") is read
+    assert matcher.match("PUT", "/api/v1/users/42") is None
+    assert matcher.match("GET", "/api/v1/users/42/extra") is None
+    assert matcher.match("GET", "/api/v1/users") is None
+
+
+def test_policy_requires_budget_unless_exempt():
+    with pytest.raises(ValueError):
+        RateLimitPolicy(name="broken", path="/x")
+    assert RateLimitPolicy(name="health", path="/health", exempt=True).exempt
+
+
+def _app(fake_redis) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/users/{user_id}")
+    async def read_user(user_id: str) -> dict[str, str]:
+        return {"id": user_id}
+
+    @app.get("/health")
+    async def health() -> dict[str, str]:
+        return {"status": "ok"}
+
+    limiter = RateLimiter(max_requests=100, window_seconds=60, client_provider=lambda: fake_redis)
+    policy = RateLimitPolicy(
+        name="user_read", path="/users/{user_id}", methods=("GET",), max_requests=2, key="user"
+    )
+    app.add_middleware(
+        RateLimitMiddleware, rate_limiter=limiter, exempt_routes=["/health"], policies=[policy]
+    )
+    return app
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_middleware_keys_policy_by_jwt_subject():
+    app = _app(fakeredis.aioredis.FakeRedis())
+
+    def auth(subject: str) -> dict[str, str]:
+        token = jwt.encode({"sub": subject}, settings.jwt_secret, algorithm=settings.jwt_algorithm)
+        return {"Authorization": f"Bearer {token}"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for _ in range(2):
+            response = await client.get("/users/1", headers=auth("alice"))
+            assert response.status_code == 200
+            assert response.headers["X-RateLimit-Limit"] == "2"
+
+        denied = await client.get("/users/1", headers=auth("alice"))
+        assert denied.status_code == 429
+        assert int(denied.headers["Retry-After"]) > 0
+
+        # Same address, different principal: separate bucket
+        assert (await client.get("/users/1", headers=auth("bob"))).status_code == 200
+
+        for _ in range(3):
+            response = await client.get("/health")
+            assert response.status_code == 200
+            assert "X-RateLimit-Limit" not in response.headers
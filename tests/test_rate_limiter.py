@@ -1,6 +1,7 @@
 """Tests for rate limiter."""
 
 import asyncio
+import math
 import time
 import pytest
 
@@ -82,3 +83,154 @@ async def test_rate_limiter_get_request_count():
         await limiter.is_allowed(client_id)
 
     assert await limiter.get_request_count(client_id) == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_check_reports_remaining_and_retry_after():
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(max_requests=2, window_seconds=10, client_provider=lambda: fake_redis)
+    client_id = "check_client"
+
+    first = await limiter.check(client_id)
+    assert first.allowed is True
+    assert first.remaining == 1
+    assert first.retry_after == 0
+    # The first request leaves the window ~10s from now, freeing its slot
+    assert 9 < first.reset_after <= 10
+    assert first.headers["X-RateLimit-Reset"] == "10"
+
+    second = await limiter.check(client_id)
+    assert second.allowed is True
+    assert second.remaining == 0
+
+    denied = await limiter.check(client_id)
+    assert denied.allowed is False
+    assert denied.remaining == 0
+    assert 0 < denied.retry_after <= 10
+    assert denied.headers["X-RateLimit-Limit"] == "2"
+    assert denied.headers["X-RateLimit-Reset"] == str(math.ceil(denied.retry_after))
+
+    # Denied requests are not recorded
+    assert await limiter.get_request_count(client_id) == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_local_mode_batches_redis_calls():
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(
+        max_requests=10,
+        window_seconds=10,
+        client_provider=lambda: fake_redis,
+        local_budget=4,
+        sync_interval=60,
+    )
+    client_id = "local_client"
+
+    # One sync grants a local allowance of 4; the next 4 requests stay in memory
+    for _ in range(5):
+        assert await limiter.is_allowed(client_id) is True
+    assert await limiter.get_request_count(client_id) == 1
+
+    # Budget exhausted: the next request syncs the 4 pending hits in one call
+    assert await limiter.is_allowed(client_id) is True
+    assert await limiter.get_request_count(client_id) == 6
+
+    results = [await limiter.is_allowed(client_id) for _ in range(10)]
+    assert results.count(True) == 4
+    await limiter.flush()
+    assert await limiter.get_request_count(client_id) == 10
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_flush_covers_policy_limiters():
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(
+        max_requests=10,
+        window_seconds=10,
+        client_provider=lambda: fake_redis,
+        local_budget=4,
+        sync_interval=60,
+    )
+    policy = limiter.with_limits(20, 10)
+    client_id = "login:ip:1.2.3.4"
+
+    for _ in range(3):
+        assert await policy.is_allowed(client_id) is True
+    assert await policy.get_request_count(client_id) == 1
+
+    # Only the root limiter is flushed (as at shutdown / by run_sync)
+    await limiter.flush()
+    assert await policy.get_request_count(client_id) == 3
+
+    # Idle policy entries are dropped, so the local table stays bounded
+    policy._local[client_id].synced_at -= 60
+    await limiter.flush()
+    assert policy._local == {}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_local_mode_remembers_denials():
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(
+        max_requests=1,
+        window_seconds=10,
+        client_provider=lambda: fake_redis,
+        local_budget=5,
+        sync_interval=60,
+    )
+    client_id = "blocked_client"
+
+    assert await limiter.is_allowed(client_id) is True
+    denied = await limiter.check(client_id)
+    assert denied.allowed is False
+
+    # Further denials are served locally until retry-after elapses
+    await fake_redis.flushall()
+    assert await limiter.is_allowed(client_id) is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "algorithm", ["sliding_window", "sliding_window_counter", "gcra", "token_bucket"]
+)
+async def test_rate_limiter_algorithms_share_contract(algorithm):
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(
+        max_requests=3, window_seconds=10, client_provider=lambda: fake_redis, algorithm=algorithm
+    )
+    client_id = f"{algorithm}_client"
+
+    assert await limiter.get_retry_after(client_id) is None
+    first = await limiter.check(client_id)
+    assert first.retry_after == 0
+    assert 0 < first.reset_after <= 10
+    for _ in range(2):
+        assert await limiter.is_allowed(client_id) is True
+    assert await limiter.is_allowed(client_id) is False
+
+    retry_after = await limiter.get_retry_after(client_id)
+    assert retry_after is not None
+    assert 0 < retry_after <= 10
+    assert await limiter.get_request_count(client_id) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("algorithm", ["sliding_window_counter", "gcra", "token_bucket"])
+async def test_rate_limiter_constant_memory_algorithms_use_one_small_key(algorithm):
+    fake_redis = fakeredis.aioredis.FakeRedis()
+    limiter = RateLimiter(
+        max_requests=100, window_seconds=10, client_provider=lambda: fake_redis, algorithm=algorithm
+    )
+
+    for _ in range(50):
+        await limiter.is_allowed("busy_client")
+
+    keys = await fake_redis.keys("rate_limit:*")
+    assert keys == [f"rate_limit:{algorithm}:{{busy_client}}".encode()]
+    if await fake_redis.type(keys[0]) == b"hash":
+        assert await fake_redis.hlen(keys[0]) <= 3
+
+
+def test_rate_limiter_rejects_unknown_algorithm():
+    with pytest.raises(ValueError):
+        RateLimiter(max_requests=1, window_seconds=1, algorithm="leaky")
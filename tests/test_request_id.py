@@ -0,0 +1,34 @@
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core.logging import request_id_ctx_var
+from app.middleware.request_id import RequestIdMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/echo")
+    async def echo() -> dict[str, str | None]:
+        return {"request_id": request_id_ctx_var.get()}
+
+    return app
+
+
+async def test_request_id_is_propagated() -> None:
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        response = await client.get("/echo", headers={"X-Request-ID": "abc-123"})
+
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert response.json() == {"request_id": "abc-123"}
+    assert request_id_ctx_var.get() is None
+
+
+async def test_request_id_is_generated_when_missing() -> None:
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        response = await client.get("/echo")
+
+    request_id = response.headers["X-Request-ID"]
+    assert request_id
+    assert response.json() == {"request_id": request_id}
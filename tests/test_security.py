@@ -0,0 +1,138 @@
+"""Tests for bearer-token authorization: cached principals and stateless tokens."""
+
+import fakeredis.aioredis
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+import app.core.security as security
+from app.cache import Cache
+from app.cache.principals import PrincipalCache
+from app.cache.revocations import TokenRevocations
+from app.core.errors import UnauthorizedError
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+from app.services.auth_service import AuthService
+
+
+async def test_current_user_is_cached_per_token_until_the_user_changes(
+    async_engine, monkeypatch, redis_provider
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    principals = PrincipalCache()
+    monkeypatch.setattr(security, "principal_cache", principals)
+    cache = Cache(redis_provider(fakeredis.aioredis.FakeRedis()))
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, principals=principals)
+        user = await repository.create(
+            full_name="Barbara Liskov", email="barbara@example.com", hashed_password="x"
+        )
+    token = AuthService.create_access_token(user.id)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    async with session_maker() as session:
+        assert (await security.get_current_user(credentials, session)).id == user.id
+    assert len(principals) == 1
+
+    # A hit needs neither the signature check nor the user lookup
+    def fail(*args, **kwargs):
+        raise AssertionError("token should not be decoded again")
+
+    decode = security.jwt.decode
+    monkeypatch.setattr(security.jwt, "decode", fail)
+    async with session_maker() as session:
+        principal = await security.get_current_user(credentials, session)
+    assert principal.full_name == "Barbara Liskov"
+    monkeypatch.setattr(security.jwt, "decode", decode)
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, principals=principals)
+        await repository.update(user.id, {"is_active": False})
+    assert len(principals) == 0
+
+    async with session_maker() as session:
+        with pytest.raises(UnauthorizedError):
+            await security.get_current_user(credentials, session)
+
+
+async def test_stateless_token_authorizes_without_lookup_until_revoked(
+    async_engine, monkeypatch, redis_provider, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    revocations = TokenRevocations(redis_provider(fakeredis.aioredis.FakeRedis()), capacity=1000)
+    await revocations.sync()
+    monkeypatch.setattr(security, "token_revocations", revocations)
+    monkeypatch.setattr(security, "principal_cache", None)
+    cache = Cache(redis_provider(fakeredis.aioredis.FakeRedis()))
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, revocations=revocations)
+        user = await repository.create(
+            full_name="Frances Allen", email="frances@example.com", hashed_password="x"
+        )
+        token = await AuthService(repository, revocations=revocations).issue_access_token(user)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    async with session_maker() as session:
+        with count_selects() as selects:
+            principal = await security.get_current_principal(credentials, session)
+    assert principal == security.Principal(id=user.id, role="user", is_active=True)
+    assert selects == []
+
+    # Unrelated fields keep the token valid; claim changes revoke it
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, revocations=revocations)
+        await repository.update(user.id, {"full_name": "Fran Allen"})
+        assert await revocations.is_current(user.id, 0) is True
+        await repository.update(user.id, {"role": User.Role.admin})
+
+    async with session_maker() as session:
+        with pytest.raises(UnauthorizedError):
+            await security.get_current_principal(credentials, session)
+
+
+async def test_failed_revocation_is_retried_and_falls_back_to_lookups(
+    async_engine, monkeypatch, redis_provider, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    redis_client = fakeredis.aioredis.FakeRedis()
+    available = True
+
+    async def get_client():
+        if not available:
+            raise ConnectionError("redis down")
+        return redis_client
+
+    revocations = TokenRevocations(get_client, capacity=1000)
+    await revocations.sync()
+    monkeypatch.setattr(security, "token_revocations", revocations)
+    monkeypatch.setattr(security, "principal_cache", None)
+    cache = Cache(redis_provider(fakeredis.aioredis.FakeRedis()))
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, revocations=revocations)
+        user = await repository.create(
+            full_name="Edsger Dijkstra", email="edsger@example.com", hashed_password="x"
+        )
+        token = await AuthService(repository, revocations=revocations).issue_access_token(user)
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    available = False
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None, revocations=revocations)
+        updated = await repository.update(user.id, {"is_active": False})
+    assert updated.is_active is False
+    assert revocations.is_stale()
+
+    # The token's claims can no longer be trusted, so it goes through the database
+    async with session_maker() as session:
+        with count_selects() as selects:
+            with pytest.raises(UnauthorizedError):
+                await security.get_current_principal(credentials, session)
+    assert selects
+
+    available = True
+    await revocations.sync()
+    assert not revocations.is_stale()
+    assert await revocations.is_current(user.id, 0) is False
@@ -0,0 +1,269 @@
+import asyncio
+
+import fakeredis.aioredis
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import Cache
+from app.cache.bloom import BloomFilter
+from app.cache.keys import make_key
+from app.cache.singleflight import SingleFlight
+from app.core.errors import BadRequestError
+from app.models.user import User
+from app.repositories.user_repository import CachedUser, UserRepository
+from app.services.user_service import UserService
+
+
+async def test_concurrent_cache_misses_share_one_query(
+    async_engine, cache, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    flight = SingleFlight()
+
+    async with session_maker() as session:
+        user = await UserRepository(session, cache, flight).create(
+            full_name="Grace Hopper", email="grace@example.com", hashed_password="x"
+        )
+
+    async def lookup() -> str | None:
+        async with session_maker() as session:
+            found = await UserRepository(session, cache, flight).get_by_id(user.id)
+            return found.email if found else None
+
+    with count_selects() as selects:
+        results = await asyncio.gather(*(lookup() for _ in range(10)))
+
+    assert results == ["grace@example.com"] * 10
+    assert len(selects) == 1
+    assert len(flight) == 0
+
+
+async def test_single_flight_shares_failures() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def failing_loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(flight.do("user:1", failing_loader) for _ in range(3)), return_exceptions=True
+    )
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_distributed_single_flight_waits_for_other_worker(redis_provider) -> None:
+    get_client = redis_provider(fakeredis.aioredis.FakeRedis())
+
+    workers = [SingleFlight(get_client, distributed=True, poll_interval=0.01) for _ in range(2)]
+    store: dict[str, str] = {}
+    calls = 0
+
+    async def loader() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        store["user:1"] = "loaded"
+        return "loaded"
+
+    async def recheck() -> str | None:
+        return store.get("user:1")
+
+    results = await asyncio.gather(
+        *(worker.do("user:1", loader, recheck=recheck) for worker in workers)
+    )
+
+    assert results == ["loaded", "loaded"]
+    assert calls == 1
+
+
+async def test_stale_user_is_served_while_refreshing_in_background(
+    async_engine, cache
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    flight = SingleFlight()
+
+    def repository(session: AsyncSession) -> UserRepository:
+        return UserRepository(session, cache, flight, session_factory=session_maker)
+
+    async with session_maker() as session:
+        user = await repository(session).create(
+            full_name="Ada", email="ada.swr@example.com", hashed_password="x"
+        )
+        await repository(session).get_by_id(user.id)
+
+    # Age the cached entry past its soft expiry and change the row underneath
+    key = make_key("user", f"s{CachedUser.VERSION}", tag=user.id)
+    stale = await cache.get(key)
+    await cache.set(key, stale, ttl=60, soft_ttl=-1)
+    async with session_maker() as session:
+        await session.execute(update(User).where(User.id == user.id).values(full_name="Ada L."))
+        await session.commit()
+
+    async with session_maker() as session:
+        served = await repository(session).get_by_id(user.id)
+    assert served.full_name == "Ada"
+    assert f"refresh:{key}" in flight
+
+    while f"refresh:{key}" in flight:
+        await asyncio.sleep(0.01)
+    async with session_maker() as session:
+        refreshed = await repository(session).get_by_id(user.id)
+    assert refreshed.full_name == "Ada L."
+
+
+async def test_unknown_users_are_negatively_cached_until_created(
+    async_engine, cache, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    flight = SingleFlight()
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, flight, email_filter=None)
+        with count_selects() as selects:
+            assert await repository.get_by_email("nobody@example.com") is None
+            assert await repository.get_by_email("nobody@example.com") is None
+            assert await repository.get_by_id("missing-id") is None
+            assert await repository.get_by_id("missing-id") is None
+        assert len(selects) == 2
+
+        user = await repository.create(
+            full_name="No Body", email="nobody@example.com", hashed_password="x"
+        )
+        found = await repository.get_by_email("nobody@example.com")
+        assert found is not None and found.id == user.id
+
+
+async def test_email_lookups_ignore_case_and_never_tombstone_existing_users(
+    async_engine, cache
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None)
+        user = await repository.create(
+            full_name="Alice Case", email="Alice.Case@Example.com", hashed_password="x"
+        )
+        await cache.delete(repository._email_key(user.email))
+
+        assert (await repository.get_by_email("ALICE.case@example.COM")).id == user.id
+        assert (await repository.get_by_email("alice.case@example.com")).id == user.id
+
+        other = await repository.create(
+            full_name="Other Case", email="other.case@example.com", hashed_password="x"
+        )
+        updated = await repository.update(other.id, {"email": "Other.New@Example.com"})
+        assert updated.email == "other.new@example.com"
+        with pytest.raises(ValueError):
+            await repository.update(other.id, {"email": "ALICE.CASE@example.com"})
+
+
+async def test_email_bloom_filter_skips_unknown_emails(
+    async_engine, redis_provider, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    redis_client = fakeredis.aioredis.FakeRedis()
+    get_client = redis_provider(redis_client)
+
+    cache, flight = Cache(get_client), SingleFlight()
+    bloom = BloomFilter(get_client, "bloom:test", capacity=1000, error_rate=0.001)
+
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, flight, email_filter=bloom)
+        await repository.create(full_name="Ada", email="ada@example.com", hashed_password="x")
+        assert await bloom.might_contain("unknown@example.com")  # not ready: fail open
+
+        assert await repository.rebuild_email_filter() >= 1
+        with count_selects() as selects:
+            assert await repository.get_by_email("unknown@example.com") is None
+        assert selects == []
+        assert await redis_client.exists("user:s2:email:{unknown@example.com}") == 0
+
+        await repository.create(full_name="Bob", email="bob@example.com", hashed_password="x")
+        assert (await repository.get_by_email("bob@example.com")).full_name == "Bob"
+
+
+async def test_cached_user_record_is_complete_and_email_key_is_a_pointer(
+    async_engine, cache, count_selects
+) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, SingleFlight(), email_filter=None)
+        user = await repository.create(
+            full_name="Ada", email="ada.ptr@example.com", hashed_password="x"
+        )
+        await repository.get_by_email("ada.ptr@example.com")
+
+        assert await cache.get(repository._email_key("ada.ptr@example.com")) == user.id
+        record = await cache.get(repository._user_key(user.id))
+        assert record["is_active"] is True and record["created_at"]
+
+        with count_selects() as selects:
+            cached = await repository.get_by_email("ADA.ptr@example.com")
+        assert selects == []
+        assert cached.id == user.id and cached.is_active and cached.created_at is not None
+
+        await repository.update(user.id, {"email": "ada.moved@example.com"})
+        assert await cache.get(repository._email_key("ada.ptr@example.com")) is None
+        assert await repository.get_by_email("ada.ptr@example.com") is None
+        moved = await repository.get_with_credentials("ada.moved@example.com")
+        assert moved.hashed_password == "x"
+
+
+async def test_user_pages_follow_keyset_cursors_with_filters(async_engine, cache) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None)
+        created = [
+            await repository.create(
+                full_name=f"Page User {i}",
+                email=f"page{i}@example.com",
+                hashed_password="x",
+                role=User.Role.admin if i % 2 else User.Role.user,
+            )
+            for i in range(5)
+        ]
+        service = UserService(repository)
+
+        seen, cursor = [], None
+        while True:
+            users, cursor = await service.list_users(2, cursor)
+            assert len(users) <= 2
+            seen.extend(users)
+            if cursor is None:
+                break
+        keys = [(user.created_at, user.id) for user in seen]
+        assert keys == sorted(keys) and len(set(keys)) == len(keys)
+        assert {user.id for user in created} <= {user.id for user in seen}
+
+        admins, cursor = await service.list_users(100, role=User.Role.admin)
+        assert cursor is None
+        assert {u.id for u in created if u.role == User.Role.admin} <= {u.id for u in admins}
+        assert all(u.role == User.Role.admin for u in admins)
+
+        with pytest.raises(BadRequestError):
+            await service.list_users(2, "not-a-cursor")
+
+
+async def test_stream_chunks_reads_in_bounded_chunks(async_engine, cache) -> None:
+    session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+    async with session_maker() as session:
+        repository = UserRepository(session, cache, hot_keys=None)
+        for i in range(5):
+            await repository.create(
+                full_name=f"Stream User {i}", email=f"stream{i}@example.com", hashed_password="x"
+            )
+
+        session.expunge_all()
+        sizes, keys = [], []
+        async for chunk in repository.stream_chunks(chunk_size=2):
+            sizes.append(len(chunk))
+            keys.extend((user.created_at, user.id) for user in chunk)
+            # Earlier chunks were released from the session
+            assert len(session.identity_map) == len(chunk)
+        assert max(sizes) == 2
+        assert keys == sorted(keys)
@@ -1,3 +1,7 @@
+import csv
+import io
+import json
+
 from httpx import AsyncClient
 
 
@@ -10,3 +14,51 @@ async def test_users_crud(client: AsyncClient) -> None:
 
     list_response = await client.get("/api/v1/users")
     assert list_response.status_code == 200
+    page = list_response.json()
+    assert set(page) == {"items", "next_cursor"}
+
+    assert (await client.get("/api/v1/users", params={"limit": 0})).status_code == 422
+    bad_cursor = await client.get("/api/v1/users", params={"cursor": "%%%"})
+    assert bad_cursor.status_code == 400
+    assert bad_cursor.json()["code"] == "bad_request"
+
+
+async def _admin_headers(client: AsyncClient) -> dict[str, str]:
+    await client.post(
+        "/api/v1/auth/register",
+        json={
+            "full_name": "export admin",
+            "email": "export-admin@example.com",
+            "password": "password123",
+            "role": "admin",
+        },
+    )
+    login = await client.post(
+        "/api/v1/auth/login",
+        json={"email": "export-admin@example.com", "password": "password123"},
+    )
+    return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+
+async def test_admin_exports_users_as_ndjson_and_csv(client: AsyncClient) -> None:
+    headers = await _admin_headers(client)
+
+    ndjson = await client.get("/api/v1/admin/users/export", headers=headers)
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert "export-admin@example.com" in {row["email"] for row in rows}
+    assert all("hashed_password" not in row for row in rows)
+
+    exported = await client.get(
+        "/api/v1/admin/users/export",
+        params={"format": "csv", "role": "admin"},
+        headers=headers,
+    )
+    assert exported.headers["content-disposition"] == 'attachment; filename="users.csv"'
+    records = list(csv.DictReader(io.StringIO(exported.text)))
+    assert {record["role"] for record in records} == {"admin"}
+    assert "export-admin@example.com" in {record["email"] for record in records}
+
+    forbidden = await client.get("/api/v1/admin/users/export")
+    assert forbidden.status_code == 401